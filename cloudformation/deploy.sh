@@ -83,15 +83,9 @@ echo "Building python lambda(s)..."
     # activate virtual environment
     source ./.venv/bin/activate
 
-    pip3 install -r requirements.txt --user
-    # rebuild the ./dist folder
-    rm -rf "${dist_path}"
-    mkdir "${dist_path}"
-    cp *.py requirements.txt "${dist_path}"
-    cp -R crhelper "${dist_path}"
-
-    echo "Installing dependencies..."
-    pip3 install --target="${dist_path}" -r "${dist_path}/requirements.txt"
+    # rebuild the ./dist folder with only the modules the handlers import,
+    # precompiled to bytecode if the virtualenv's python matches the runtime
+    python3 build.py --dist "${dist_path}" --runtime python3.6
 ) >& /tmp/$$.build
 
 if [ $? -ne 0 ]; then
@@ -101,6 +95,11 @@ if [ $? -ne 0 ]; then
     exit 3
 fi
 
+# display the build output, including a warning if nothing was precompiled,
+# and the build report with sizes and import times
+cat /tmp/$$.build
+cat "${lambda_code_path}/build-report.json"
+
 
 #####################################################################
 # DEPLOY TEMPLATE - cfn_template_s3
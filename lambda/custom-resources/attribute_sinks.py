@@ -0,0 +1,116 @@
+"""
+Destinations the app client attributes can be written to, so consumers can
+read them without calling describe_user_pool_client.
+
+A sink is selected by the scheme of the `ExportSink` property:
+
+- `file:///path/to/clients.json` writes a JSON document to a local file,
+  shared by the app clients that export to it
+- `ssm:///parameter/prefix` writes one SecureString parameter per user pool,
+  named `<prefix>/<UserPoolId>`
+
+Additional sinks can be added with `register_sink`.
+"""
+
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+import boto3
+import json
+import logging
+import os
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+_sinks = {}
+
+
+def register_sink(scheme, factory):
+    """
+    Registers `factory(uri)` for an `ExportSink` scheme. The factory returns
+    an object with `write(records)` and `delete(records)` methods, every
+    record being a dict of exported attributes of one user pool.
+    """
+    _sinks[scheme] = factory
+
+
+def get_sink(uri):
+    parsed = urlparse(uri)
+    factory = _sinks.get(parsed.scheme)
+    if factory is None:
+        raise ValueError("unsupported ExportSink: {}".format(uri))
+    return factory(parsed)
+
+
+class FileSink(object):
+    """
+    Keeps the records of all app clients that export to the same file, a
+    record is replaced or removed by its ClientId.
+    """
+
+    def __init__(self, uri):
+        self._path = uri.path
+
+    def write(self, records):
+        client_ids = [record["ClientId"] for record in records]
+        existing = [record for record in self._read() if record["ClientId"] not in client_ids]
+        self._write(existing + list(records))
+        logger.debug("Wrote app client attributes to {}".format(self._path))
+
+    def delete(self, records):
+        # the file may already hold the records of clients that replaced these
+        client_ids = [record["ClientId"] for record in records]
+        remaining = [record for record in self._read() if record["ClientId"] not in client_ids]
+        if remaining:
+            self._write(remaining)
+        elif os.path.exists(self._path):
+            os.remove(self._path)
+
+    def _read(self):
+        if not os.path.exists(self._path):
+            return []
+        with open(self._path) as sink_file:
+            return json.load(sink_file).get("UserPoolClients", [])
+
+    def _write(self, records):
+        # write to a temporary file first, so readers never see a partial document
+        temporary_path = "{}.tmp".format(self._path)
+        with open(temporary_path, "w") as sink_file:
+            json.dump({"UserPoolClients": records}, sink_file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self._path)
+
+
+class SsmSink(object):
+
+    def __init__(self, uri):
+        self._prefix = uri.path.rstrip("/")
+        self._client = boto3.client("ssm", region_name=os.getenv('AWS_REGION'))
+
+    def write(self, records):
+        for record in records:
+            self._client.put_parameter(
+                Name=self._name(record),
+                Value=json.dumps(record, sort_keys=True),
+                Type="SecureString",
+                Overwrite=True
+            )
+            logger.debug("Wrote app client attributes to {}".format(self._name(record)))
+
+    def delete(self, records):
+        for record in records:
+            try:
+                response = self._client.get_parameter(Name=self._name(record), WithDecryption=True)
+            except self._client.exceptions.ParameterNotFound:
+                logger.debug("Unable to find parameter to delete: {}".format(self._name(record)))
+                continue
+            # the parameter may already hold the attributes of a client that replaced this one
+            if json.loads(response["Parameter"]["Value"]).get("ClientId") == record["ClientId"]:
+                self._client.delete_parameter(Name=self._name(record))
+
+    def _name(self, record):
+        return "{}/{}".format(self._prefix, record["UserPoolId"])
+
+
+register_sink("file", FileSink)
+register_sink("ssm", SsmSink)
@@ -0,0 +1,273 @@
+"""
+Builds the Lambda artifact of the custom resources.
+
+Usage:
+
+    python build.py --dist dist
+
+Only the modules the handlers import are shipped: the local modules reached
+from the handler modules and the third party packages they pull in. Tests,
+package metadata and the botocore/boto3 models of services the code never
+creates a client for are stripped. Everything is precompiled to bytecode,
+so the read-only Lambda file system does not force a compile on every cold
+start. A report of the artifact size and the import time of every handler
+module is written to `build-report.json`.
+
+Bytecode is only loaded by the Python version that wrote it. When `--runtime`
+names another Python version than the one running this build, nothing is
+precompiled and no import times are measured, since neither would apply to
+the runtime. Build with the runtime's interpreter, e.g. in its build image:
+
+    docker run --rm -v "$PWD":/var/task public.ecr.aws/sam/build-python3.6 \
+        python build.py --dist dist --runtime python3.6
+"""
+
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+import argparse
+import compileall
+import json
+import logging
+import modulefinder
+import os
+import py_compile
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+SOURCE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Modules in the source folder that are tooling rather than Lambda code
+EXCLUDED_MODULES = ["build", "drift_scanner"]
+
+# Directories and files that are never needed at runtime, documentation
+# folders are kept when they are Python packages (e.g. botocore.docs)
+STRIPPED_DIRECTORIES = ["tests", "test", "__pycache__"]
+STRIPPED_DATA_DIRECTORIES = ["docs", "doc", "examples"]
+STRIPPED_EXTENSIONS = [".pyi", ".pyx", ".pxd", ".c", ".h", ".md", ".rst", ".typed"]
+
+# Packages that ship one model folder per AWS service
+SERVICE_MODEL_PATHS = [os.path.join("botocore", "data"), os.path.join("boto3", "data")]
+
+_HANDLER = re.compile(r"^def handler\(", re.MULTILINE)
+# boto3.client("...") calls and service_name="..." arguments of pool_targets.get_client
+_CLIENT = re.compile(r"""(?:\.client\(\s*|\bservice_name\s*=\s*)["']([\w-]+)["']""")
+
+
+def find_handlers(source_path=SOURCE_PATH):
+    """
+    Returns the names of the modules that define a Lambda `handler`.
+    """
+    handlers = []
+    for file_name in sorted(os.listdir(source_path)):
+        name, extension = os.path.splitext(file_name)
+        if extension != ".py" or name in EXCLUDED_MODULES:
+            continue
+        with open(os.path.join(source_path, file_name)) as source_file:
+            if _HANDLER.search(source_file.read()):
+                handlers.append(name)
+    return handlers
+
+
+def resolve_imports(handlers, source_path, site_packages):
+    """
+    Returns the local module files and the third party top level packages
+    imported by the handlers.
+    """
+    finder = modulefinder.ModuleFinder(path=[source_path, site_packages] + sys.path[1:])
+    for handler in handlers:
+        finder.run_script(os.path.join(source_path, "{}.py".format(handler)))
+
+    # every handler is run as __main__, so they are not all in finder.modules
+    local_files = set("{}.py".format(handler) for handler in handlers)
+    packages = set()
+    for module in finder.modules.values():
+        path = module.__file__
+        if not path:
+            continue
+        path = os.path.abspath(path)
+        if path.startswith(os.path.join(site_packages, "")):
+            packages.add(os.path.relpath(path, site_packages).split(os.sep)[0])
+        elif path.startswith(os.path.join(source_path, "")):
+            local_files.add(os.path.relpath(path, source_path))
+    return sorted(local_files), sorted(packages)
+
+
+def find_services(dist_path, local_files):
+    """
+    Returns the AWS services the local modules create clients for.
+    """
+    services = set()
+    for local_file in local_files:
+        with open(os.path.join(dist_path, local_file)) as source_file:
+            services.update(_CLIENT.findall(source_file.read()))
+    return sorted(services)
+
+
+def strip(dist_path, services):
+    """
+    Removes tests, docs, sources of extension modules and unused service models.
+    """
+    for model_path in SERVICE_MODEL_PATHS:
+        model_path = os.path.join(dist_path, model_path)
+        if not os.path.isdir(model_path):
+            continue
+        for service in os.listdir(model_path):
+            service_path = os.path.join(model_path, service)
+            if os.path.isdir(service_path) and service not in services:
+                shutil.rmtree(service_path)
+
+    for directory, directories, files in os.walk(dist_path):
+        for name in list(directories):
+            is_package = os.path.exists(os.path.join(directory, name, "__init__.py"))
+            if name in STRIPPED_DIRECTORIES or (name in STRIPPED_DATA_DIRECTORIES and not is_package):
+                shutil.rmtree(os.path.join(directory, name))
+                directories.remove(name)
+        for name in files:
+            if os.path.splitext(name)[1] in STRIPPED_EXTENSIONS:
+                os.remove(os.path.join(directory, name))
+
+
+def precompile(dist_path):
+    """
+    Compiles every module to bytecode. The pyc files are not checked against
+    the sources, since the artifact is never modified after the build.
+    """
+    kwargs = {}
+    if hasattr(py_compile, "PycInvalidationMode"):
+        kwargs["invalidation_mode"] = py_compile.PycInvalidationMode.UNCHECKED_HASH
+    if not compileall.compile_dir(dist_path, quiet=1, **kwargs):
+        raise ValueError("unable to compile {}".format(dist_path))
+
+
+def measure_import_time(dist_path, module, runs=3):
+    """
+    Returns the fastest of several fresh-interpreter imports of a module, in
+    milliseconds, without writing bytecode, like on the Lambda file system.
+    """
+    script = (
+        "import importlib, sys, time\n"
+        "sys.path.insert(0, {!r})\n"
+        "start = time.perf_counter()\n"
+        "importlib.import_module({!r})\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    ).format(dist_path, module)
+    env = dict(os.environ)
+    env.setdefault("AWS_REGION", "us-east-1")
+
+    timings = []
+    for _ in range(runs):
+        # -S keeps the build environment's site-packages out of the way, -B
+        # mimics the read-only file system of Lambda
+        output = subprocess.check_output([sys.executable, "-S", "-E", "-B", "-c", script],
+                                         cwd=tempfile.gettempdir(), env=env)
+        timings.append(float(output.decode().strip().splitlines()[-1]))
+    return round(min(timings), 2)
+
+
+def artifact_size(dist_path):
+    files = 0
+    size = 0
+    with tempfile.TemporaryFile() as archive:
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for directory, _, names in os.walk(dist_path):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    files += 1
+                    size += os.path.getsize(path)
+                    zip_file.write(path, os.path.relpath(path, dist_path))
+        zipped_size = archive.tell()
+    return {"Files": files, "Bytes": size, "ZippedBytes": zipped_size}
+
+
+def build(dist_path, requirements, site_packages=None, source_path=SOURCE_PATH, runtime=None):
+    """
+    Builds the artifact in `dist_path` and returns the build report.
+    Bytecode and import times are skipped if `runtime` is not the Python
+    version running the build.
+    """
+    python = "python{}.{}".format(*sys.version_info[:2])
+    precompiled = runtime in (None, python)
+    staging_path = None
+    if site_packages is None:
+        staging_path = tempfile.mkdtemp()
+        site_packages = staging_path
+        logger.info("Installing dependencies..")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "--quiet",
+                               "--target", site_packages, "-r", requirements])
+    site_packages = os.path.abspath(site_packages)
+
+    try:
+        handlers = find_handlers(source_path)
+        local_files, packages = resolve_imports(handlers, source_path, site_packages)
+
+        if os.path.exists(dist_path):
+            shutil.rmtree(dist_path)
+        os.makedirs(dist_path)
+
+        for local_file in local_files:
+            target = os.path.join(dist_path, local_file)
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+            shutil.copy2(os.path.join(source_path, local_file), target)
+        for package in packages:
+            source = os.path.join(site_packages, package)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(dist_path, package))
+            else:
+                shutil.copy2(source, dist_path)
+    finally:
+        if staging_path:
+            shutil.rmtree(staging_path)
+
+    services = find_services(dist_path, local_files)
+    strip(dist_path, services)
+    if precompiled:
+        precompile(dist_path)
+    else:
+        logger.warning("Building with {} for the {} runtime, skipping bytecode and import times"
+                       .format(python, runtime))
+
+    return {
+        "Python": "{}.{}".format(*sys.version_info[:2]),
+        "Runtime": runtime or python,
+        "Precompiled": precompiled,
+        "Handlers": handlers,
+        "LocalModules": local_files,
+        "Packages": packages,
+        "Services": services,
+        "Artifact": artifact_size(dist_path),
+        "ImportTimeMs": dict((handler, measure_import_time(dist_path, handler))
+                             for handler in handlers if precompiled),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the custom resources Lambda artifact.")
+    parser.add_argument("--dist", default=os.path.join(SOURCE_PATH, "dist"), help="output folder")
+    parser.add_argument("--requirements", default=os.path.join(SOURCE_PATH, "requirements.txt"))
+    parser.add_argument("--site-packages", help="use already installed dependencies instead of pip")
+    parser.add_argument("--report", default=os.path.join(SOURCE_PATH, "build-report.json"))
+    parser.add_argument("--runtime", help="Lambda runtime, e.g. python3.6, nothing is precompiled for another Python")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    report = build(os.path.abspath(args.dist), args.requirements, args.site_packages, runtime=args.runtime)
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+    logger.info("Artifact: {Files} files, {Bytes} bytes, {ZippedBytes} bytes zipped".format(**report["Artifact"]))
+    for handler, milliseconds in sorted(report["ImportTimeMs"].items()):
+        logger.info("Import time of {}: {} ms".format(handler, milliseconds))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
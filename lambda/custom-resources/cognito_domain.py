@@ -1,13 +1,17 @@
 __version__ = '0.1.0'
 __version_info__ = tuple([int(num) for num in __version__.split('.')])
 
-import boto3
 from crhelper import CfnResource
 import logging
+import pool_targets
+import resource_models
+import schemas
 
 logger = logging.getLogger(__name__)
 # Initialise the helper, all inputs are optional, this example shows the defaults
 helper = CfnResource(json_logging=False, log_level='DEBUG', boto_level='CRITICAL')
+helper.validate(schemas.COGNITO_DOMAIN.validate)
+helper.validate_delete(schemas.COGNITO_DOMAIN.validate_delete)
 
 @helper.create
 def create(event, context):
@@ -23,10 +27,11 @@ def create(event, context):
     resource_properties = event["ResourceProperties"]
 
     user_pool_id = resource_properties.get("UserPoolId")
-    domain = resource_properties.get("CognitoDomainPrefix")
+    domain = resource_models.cognito_domain(resource_properties)["Domain"]
     cognito_region = resource_properties.get("CognitoRegion")
+    role_arn = resource_properties.get("RoleArn")
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    client = pool_targets.get_client(cognito_region, role_arn)
 
     try:
         client.create_user_pool_domain(
@@ -55,41 +60,37 @@ def update(event, context):
     resource_properties = event["ResourceProperties"]
 
     user_pool_id = resource_properties.get("UserPoolId")
-    domain = resource_properties.get("CognitoDomainPrefix")
+    domain = resource_models.cognito_domain(resource_properties)["Domain"]
     cognito_region = resource_properties.get("CognitoRegion")
+    role_arn = resource_properties.get("RoleArn")
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    client = pool_targets.get_client(cognito_region, role_arn)
 
-    if domain is not None:
-        try:
-            response = client.describe_user_pool(
-                UserPoolId=user_pool_id
-            )
-
-            existing_domain = response.get("UserPool").get("Domain")
+    try:
+        response = client.describe_user_pool(
+            UserPoolId=user_pool_id
+        )
 
-            if existing_domain is not None:
-                client.delete_user_pool_domain(
-                    Domain=existing_domain,
-                    UserPoolId=user_pool_id
-                )
-                print("Domain " + existing_domain + " has been deleted")
+        existing_domain = response.get("UserPool").get("Domain")
 
-            client.create_user_pool_domain(
-                Domain=domain,
+        if existing_domain is not None:
+            client.delete_user_pool_domain(
+                Domain=existing_domain,
                 UserPoolId=user_pool_id
             )
+            print("Domain " + existing_domain + " has been deleted")
 
-            physical_resource_id = domain
-            return physical_resource_id
+        client.create_user_pool_domain(
+            Domain=domain,
+            UserPoolId=user_pool_id
+        )
 
-        except Exception as err:
-            logger.error("exception occured: {}".format(err))
-            raise ValueError("unable to update cognito domain: {}".format(err))
+        physical_resource_id = domain
+        return physical_resource_id
 
-    else:
-        raise ValueError(
-            "CognitoDomainPrefix is required when creating a UserPool Domain.")
+    except Exception as err:
+        logger.error("exception occured: {}".format(err))
+        raise ValueError("unable to update cognito domain: {}".format(err))
 
 @helper.delete
 def delete(event, context):
@@ -102,10 +103,11 @@ def delete(event, context):
     resource_properties = event["ResourceProperties"]
 
     user_pool_id = resource_properties.get("UserPoolId")
-    domain = resource_properties.get("CognitoDomainPrefix")
+    domain = resource_models.cognito_domain(resource_properties)["Domain"]
     cognito_region = resource_properties.get("CognitoRegion")
+    role_arn = resource_properties.get("RoleArn")
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    client = pool_targets.get_client(cognito_region, role_arn)
 
     response = client.describe_user_pool(
         UserPoolId=user_pool_id
@@ -120,13 +122,6 @@ def delete(event, context):
         )
     return
 
-@helper.poll_create
-def poll_create(event, context):
-    logger.info("Create polling..")
-    # Return a resource id or True to indicate that creation is complete. if True is returned an id
-    # will be generated
-    return True
-
 def handler(event, context):
     """
     Main handler function, passes off it's work to crhelper's cfn_handler
@@ -0,0 +1,106 @@
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+import boto3
+import calendar
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Credentials are refreshed once they get this close (in seconds) to expiring
+REFRESH_WINDOW = 300
+# Duration (in seconds) of the assumed role sessions
+SESSION_DURATION = 3600
+SESSION_NAME = "cognito-custom-resources"
+
+
+def _sts_client(region):
+    return boto3.client("sts", region_name=region)
+
+
+class CredentialCache(object):
+    """
+    Caches the credentials of assumed roles, keyed by role arn and region.
+
+    A single instance is shared by every invocation of a warm container and
+    is safe to use from concurrent worker threads. Only one `assume_role`
+    call is made per role and region at a time, concurrent callers wait for
+    its result. `sts_client_factory` takes a region and returns an STS
+    client, which allows a local STS stand-in to be used instead.
+    """
+
+    def __init__(self, sts_client_factory=_sts_client, refresh_window=REFRESH_WINDOW,
+                 session_duration=SESSION_DURATION, session_name=SESSION_NAME, clock=time.time):
+        self._sts_client_factory = sts_client_factory
+        self._refresh_window = refresh_window
+        self._session_duration = session_duration
+        self._session_name = session_name
+        self._clock = clock
+        self._credentials = {}
+        self._sts_clients = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, role_arn, region):
+        """
+        Returns the `Credentials` of `sts.assume_role` for the role, assuming
+        the role again if the cached credentials are about to expire.
+        """
+        key = (role_arn, region)
+        credentials = self._credentials.get(key)
+        if self._is_fresh(credentials):
+            return credentials
+
+        with self._key_lock(key):
+            # another thread may have refreshed the credentials while this
+            # one was waiting for the lock
+            credentials = self._credentials.get(key)
+            if not self._is_fresh(credentials):
+                credentials = self._assume_role(role_arn, region)
+                self._credentials[key] = credentials
+        return credentials
+
+    def clear(self):
+        with self._lock:
+            self._credentials.clear()
+
+    def _is_fresh(self, credentials):
+        if credentials is None:
+            return False
+        return _timestamp(credentials["Expiration"]) - self._clock() > self._refresh_window
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _get_sts_client(self, region):
+        with self._lock:
+            client = self._sts_clients.get(region)
+            if client is None:
+                client = self._sts_client_factory(region)
+                self._sts_clients[region] = client
+        return client
+
+    def _assume_role(self, role_arn, region):
+        logger.debug("Assuming role {} in {}..".format(role_arn, region))
+        response = self._get_sts_client(region).assume_role(
+            RoleArn=role_arn,
+            RoleSessionName=self._session_name,
+            DurationSeconds=self._session_duration
+        )
+        return response["Credentials"]
+
+
+def _timestamp(expiration):
+    """
+    STS returns the expiration as a datetime, stand-ins may use epoch seconds.
+    """
+    if hasattr(expiration, "utctimetuple"):
+        return calendar.timegm(expiration.utctimetuple())
+    return float(expiration)
+
+
+# Shared by all handlers in the container
+default_cache = CredentialCache()
@@ -1,6 +1,14 @@
 from __future__ import print_function
 import json
 import logging
+import random
+
+# Fields whose values are never logged, matched case-insensitively as substrings of the key
+REDACTED_FIELDS = ('secret', 'password', 'token', 'credentials', 'accesskey')
+# Fields that are kept when an event summary has to be cut down to its size cap
+SUMMARY_FIELDS = ('RequestType', 'ResourceType', 'StackId', 'RequestId', 'LogicalResourceId',
+                  'PhysicalResourceId', 'Status', 'Reason')
+REDACTED = '***'
 
 
 def _json_formatter(obj):
@@ -81,3 +89,64 @@ def setup(level='DEBUG', formatter_cls=JsonFormatter, boto_level=None, **kwargs)
     logging.getLogger('boto3').setLevel(boto_level)
     logging.getLogger('botocore').setLevel(boto_level)
     logging.getLogger('urllib3').setLevel(boto_level)
+
+
+def redact_url(url):
+    """Removes the query string, which holds the signature of pre-signed urls."""
+    if not isinstance(url, str) or '?' not in url:
+        return url
+    return url.split('?', 1)[0] + '?' + REDACTED
+
+
+class EventSummaryLogger(object):
+    """Logs size capped summaries of events and responses, with sensitive fields redacted.
+
+    Whether a request is logged is decided once per request by ``sample()``, so either all or none of its summaries
+    are logged. ``force`` logs a summary regardless of the sample, e.g. for failures.
+    """
+
+    def __init__(self, sample_rate=1.0, redacted_fields=REDACTED_FIELDS, max_field_length=256, max_size=4096,
+                 log=None, rand=random.random):
+        self._sample_rate = sample_rate
+        self._redacted_fields = tuple(field.lower() for field in redacted_fields)
+        self._max_field_length = max_field_length
+        self._max_size = max_size
+        self._logger = log or logging.getLogger(__name__)
+        self._random = rand
+        self._sampled = True
+
+    def sample(self):
+        self._sampled = self._random() < self._sample_rate
+        return self._sampled
+
+    def log(self, message, obj, force=False):
+        if not (self._sampled or force) or not self._logger.isEnabledFor(logging.DEBUG):
+            return
+        self._logger.debug(json.dumps({'message': message, 'summary': self.summarise(obj)}, default=str))
+
+    def summarise(self, obj):
+        summary = self._summarise(obj)
+        if len(json.dumps(summary, default=str)) <= self._max_size:
+            return summary
+        if isinstance(summary, dict):
+            summary = dict((k, v) for k, v in summary.items() if k in SUMMARY_FIELDS)
+            summary['Truncated'] = True
+            return summary
+        return {'Truncated': True}
+
+    def _summarise(self, obj, key=''):
+        if key and any(field in key.lower() for field in self._redacted_fields):
+            return REDACTED
+        if isinstance(obj, dict):
+            return dict((k, self._summarise(v, str(k))) for k, v in obj.items())
+        if isinstance(obj, (list, tuple)):
+            items = [self._summarise(v, key) for v in obj[:10]]
+            if len(obj) > 10:
+                items.append('... ({} more)'.format(len(obj) - 10))
+            return items
+        if isinstance(obj, str):
+            if key.lower().endswith('url'):
+                obj = redact_url(obj)
+            if len(obj) > self._max_field_length:
+                return obj[:self._max_field_length] + '... ({} more)'.format(len(obj) - self._max_field_length)
+        return obj
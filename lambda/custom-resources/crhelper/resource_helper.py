@@ -8,6 +8,10 @@ TODO:
 """
 
 from __future__ import print_function
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import functools
 import threading
 from crhelper.utils import _send_response
 from crhelper import log_helper
@@ -17,6 +21,7 @@ import boto3
 import string
 import json
 import os
+import re
 from time import sleep
 
 logger = logging.getLogger(__name__)
@@ -27,20 +32,30 @@ FAILED = 'FAILED'
 
 class CfnResource(object):
 
-    def __init__(self, json_logging=False, log_level='DEBUG', boto_level='ERROR', polling_interval=2):
+    def __init__(self, json_logging=False, log_level='DEBUG', boto_level='ERROR', polling_interval=2,
+                 max_workers=8, log_sample_rate=1.0, log_redacted_fields=log_helper.REDACTED_FIELDS,
+                 log_max_field_length=256, log_max_size=4096):
         self._create_func = None
         self._update_func = None
         self._delete_func = None
         self._poll_create_func = None
         self._poll_update_func = None
         self._poll_delete_func = None
+        self._validate_func = None
+        self._validate_delete_func = None
         self._timer = None
         self._init_failed = None
         self._json_logging = json_logging
         self._log_level = log_level
         self._boto_level = boto_level
+        self._event_logger = log_helper.EventSummaryLogger(
+            sample_rate=log_sample_rate, redacted_fields=log_redacted_fields,
+            max_field_length=log_max_field_length, max_size=log_max_size, log=logger)
         self._send_response = False
         self._polling_interval = polling_interval
+        self._max_workers = max_workers
+        self._loop = None
+        self._executor = None
         self.Status = ""
         self.Reason = ""
         self.PhysicalResourceId = ""
@@ -48,7 +63,10 @@ class CfnResource(object):
         self.RequestId = ""
         self.LogicalResourceId = ""
         self.Data = {}
+        self.NoEcho = False
+        self.SkipPolling = False
         self._event = {}
+        self._poll_data = None
         self._context = None
         self._response_url = ""
         self._sam_local = os.getenv('AWS_SAM_LOCAL')
@@ -69,7 +87,8 @@ class CfnResource(object):
     def __call__(self, event, context):
         try:
             self._log_setup(event, context)
-            logger.debug(event)
+            self._event_logger.sample()
+            self._event_logger.log("Received event", event)
             self._crhelper_init(event, context)
             # Check for polling functions
             if self._poll_enabled() and self._sam_local:
@@ -116,8 +135,13 @@ class CfnResource(object):
         self.RequestId = event["RequestId"]
         self.LogicalResourceId = event["LogicalResourceId"]
         self.Data = {}
+        self._poll_data = None
         if "CrHelperData" in event.keys():
             self.Data = event["CrHelperData"]
+            self._poll_data = copy.deepcopy(self.Data)
+        # A NoEcho response set before polling started must stay NoEcho once polling completes
+        self.NoEcho = event.get("CrHelperNoEcho", False)
+        self.SkipPolling = False
         self.RequestType = event["RequestType"]
         self._event = event
         self._context = context
@@ -127,7 +151,8 @@ class CfnResource(object):
         if self._init_failed:
             return self._send(FAILED, str(self._init_failed))
         self._set_timeout()
-        self._wrap_function(self._get_func())
+        if self._validate_properties():
+            self._wrap_function(self._get_func())
 
     def _polling_init(self, event):
         # Setup polling on initial request
@@ -144,6 +169,10 @@ class CfnResource(object):
             logger.info("Polling complete, removing cwe schedule")
             self._remove_polling()
             self._send_response = True
+        elif 'CrHelperPoll' in event.keys() and self.Data != self._poll_data:
+            # Carry the state the poll function kept in Data over to the next poll
+            logger.info("Poll data changed, updating cwe target")
+            self._put_targets(self._context.function_name)
 
     def _cfn_response(self, event):
         # Use existing PhysicalResourceId if it's in the event and no ID was set
@@ -160,6 +189,9 @@ class CfnResource(object):
         self._send()
 
     def _poll_enabled(self):
+        # A handler can respond right away when there is nothing to poll for, once polling started it runs to the end
+        if self.SkipPolling and 'CrHelperPoll' not in self._event.keys():
+            return None
         return getattr(self, "_poll_{}_func".format(self._event['RequestType'].lower()))
 
     def create(self, func):
@@ -186,14 +218,78 @@ class CfnResource(object):
         self._poll_delete_func = func
         return func
 
+    def validate(self, func):
+        self._validate_func = func
+        return func
+
+    def validate_delete(self, func):
+        self._validate_delete_func = func
+        return func
+
+    def _validate_properties(self):
+        # Validation runs before the handler, so invalid properties fail before any call to AWS is made. Deletes use
+        # their own validation, which should only check what is needed to locate the resource
+        func = self._validate_delete_func if self.RequestType == 'Delete' else self._validate_func
+        if not func or "CrHelperPoll" in self._event.keys():
+            return True
+        try:
+            self._event['ResourceProperties'] = func(self._event.get('ResourceProperties', {}))
+        except Exception as e:
+            if self.RequestType == 'Delete' and self._generated_physical_id():
+                # The create failed before the handler returned an id, so nothing was created and the rollback has
+                # to be able to complete
+                logger.warning("Invalid resource properties of a resource that was never created, skipping delete: {}"
+                               .format(e))
+                return False
+            logger.error(str(e))
+            self.Reason = str(e)
+            self.Status = FAILED
+            return False
+        return True
+
+    def _generated_physical_id(self):
+        # Matches the ids _cfn_response generates when a create did not return one
+        pattern = re.escape(self.StackId.split('/')[1] + '_' + self.LogicalResourceId) + '_[A-Z0-9]{8}'
+        return re.fullmatch(pattern, str(self._event.get('PhysicalResourceId', ''))) is not None
+
     def _wrap_function(self, func):
         try:
-            self.PhysicalResourceId = func(self._event, self._context) if func else ''
+            if func and asyncio.iscoroutinefunction(func):
+                self.PhysicalResourceId = self._run_async(func)
+            else:
+                self.PhysicalResourceId = func(self._event, self._context) if func else ''
         except Exception as e:
             logger.error(str(e), exc_info=True)
             self.Reason = str(e)
             self.Status = FAILED
 
+    def _get_loop(self):
+        # The loop and its executor are reused across warm invocations
+        if self._loop is None or self._loop.is_closed():
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(self._executor)
+            asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def _run_async(self, func):
+        # Give up a second before the lambda times out, the timeout timer sends a failure at half a second
+        timeout = (self._context.get_remaining_time_in_millis() / 1000.00) - 1
+        try:
+            return self._get_loop().run_until_complete(
+                asyncio.wait_for(func(self._event, self._context), timeout))
+        except asyncio.TimeoutError:
+            logger.error("Execution is about to time out, cancelled handler")
+            raise Exception("Execution timed out")
+
+    def run_in_executor(self, func, *args, **kwargs):
+        """Runs a blocking call, such as a boto3 client method, in the bounded executor.
+
+        Returns an awaitable for use in ``async def`` handlers. Cancelling the awaitable does not interrupt the
+        call, it only stops the handler from waiting for it.
+        """
+        return self._get_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
     def _timeout(self):
         logger.error("Execution is about to time out, sending failure message")
         self._send(FAILED, "Execution timed out")
@@ -223,8 +319,11 @@ class CfnResource(object):
             'Reason': str(self.Reason),
             'Data': self.Data,
         }
+        if self.NoEcho:
+            response_body['NoEcho'] = True
         if status:
             response_body.update({'Status': status, 'Reason': reason})
+        self._event_logger.log("Sending response", response_body, force=response_body['Status'] == FAILED)
         send_response(self._response_url, response_body)
 
     def init_failure(self, error):
@@ -264,7 +363,8 @@ class CfnResource(object):
         account_id = self._event['CrHelperRule'].split(":")[4]
         partition = self._event['CrHelperRule'].split(":")[1]
         rule_name = self._event['CrHelperRule'].split("/")[1]
-        logger.debug(self._event)
+        self._event['CrHelperNoEcho'] = self.NoEcho
+        self._event_logger.log("Polling event", self._event)
         self._events_client.put_targets(
             Rule=rule_name,
             Targets=[
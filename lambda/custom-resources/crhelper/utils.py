@@ -1,4 +1,5 @@
 from __future__ import print_function
+from crhelper import log_helper
 import requests
 import json
 import logging as logging
@@ -15,8 +16,7 @@ def _send_response(response_url, response_body, put=requests.put):
         logger.error(msg, exc_info=True)
         response_body = {'Status': 'FAILED', 'Data': {}, 'Reason': msg}
         json_response_body = json.dumps(response_body)
-    logger.debug("CFN response URL: {}".format(response_url))
-    logger.debug(json_response_body)
+    logger.debug("CFN response URL: {}".format(log_helper.redact_url(response_url)))
     headers = {'content-type': '', 'content-length': str(len(json_response_body))}
     while True:
         try:
@@ -0,0 +1,290 @@
+"""
+Compares the Cognito resources declared for the custom resources against the
+live state of their user pools.
+
+Usage:
+
+    python drift_scanner.py declarations.json > drift.jsonl
+
+`declarations.json` holds a list of declared resources, using the same
+Properties as the custom resources in the CloudFormation templates:
+
+    [
+        {
+            "LogicalResourceId": "CognitoResourceServer",
+            "Type": "ResourceServer",
+            "Properties": {"UserPoolId": "...", "CognitoRegion": "...", ...}
+        },
+        {
+            "LogicalResourceId": "CognitoAppClientInternal",
+            "Type": "UserPoolClient",
+            "PhysicalResourceId": "...",
+            "Properties": {...}
+        }
+    ]
+
+App clients are identified by the PhysicalResourceId of their custom
+resource (see `aws cloudformation describe-stack-resources`), since the name
+of an app client does not have to be unique.
+
+User pools are scanned concurrently and one JSON report per declared resource
+and user pool is written per line as soon as its user pool has been scanned.
+"""
+
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import logging
+import pool_targets
+import resource_models
+import schemas
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IN_SYNC = 'IN_SYNC'
+MODIFIED = 'MODIFIED'
+MISSING = 'MISSING'
+ERROR = 'ERROR'
+
+COGNITO_DOMAIN = 'CognitoDomain'
+RESOURCE_SERVER = 'ResourceServer'
+USER_POOL_CLIENT = 'UserPoolClient'
+
+SCHEMAS = {
+    COGNITO_DOMAIN: schemas.COGNITO_DOMAIN,
+    RESOURCE_SERVER: schemas.RESOURCE_SERVER,
+    USER_POOL_CLIENT: schemas.USER_POOL_CLIENT,
+}
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiting the calls per second, shared by all workers.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        self._rate = float(rate)
+        self._burst = float(burst or max(1, rate))
+        self._tokens = self._burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            self._sleep(wait)
+
+
+class DriftScanner(object):
+    """
+    Scans user pools for drift from their declared resources.
+
+    `client_factory(region, role_arn)` returns the cognito-idp client of a
+    region, which allows a local fake backend to be used instead. Cognito
+    quotas apply per account and region, so every role and region gets its
+    own rate limiter of `rate` calls per second.
+    """
+
+    def __init__(self, client_factory=pool_targets.get_client, max_workers=16, rate=5):
+        self._client_factory = client_factory
+        self._max_workers = max_workers
+        self._rate = rate
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def scan(self, declarations):
+        """
+        Yields a drift report for every declared resource and user pool.
+        """
+        pools = OrderedDict()
+        for declaration in declarations:
+            try:
+                properties = SCHEMAS[declaration.get("Type")].validate(declaration.get("Properties", {}))
+            except KeyError:
+                yield _report(declaration, {}, ERROR,
+                              Reason="unknown resource type: {}".format(declaration.get("Type")))
+                continue
+            except ValueError as err:
+                yield _report(declaration, {}, ERROR, Reason=str(err))
+                continue
+
+            for target in pool_targets.get_targets(properties):
+                key = (target["CognitoRegion"], target["UserPoolId"], target["RoleArn"])
+                pools.setdefault(key, []).append((declaration, properties))
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            futures = [executor.submit(self._scan_pool, key, resources) for key, resources in pools.items()]
+            for future in as_completed(futures):
+                for report in future.result():
+                    yield report
+
+    def _scan_pool(self, key, resources):
+        region, user_pool_id, role_arn = key
+        target = {"CognitoRegion": region, "UserPoolId": user_pool_id, "RoleArn": role_arn}
+        types = set(declaration["Type"] for declaration, _ in resources)
+
+        try:
+            client = self._client_factory(region, role_arn)
+            # app clients are described one by one, by their client id
+            state = {USER_POOL_CLIENT: None}
+            if COGNITO_DOMAIN in types:
+                response = self._call(target, client.describe_user_pool, UserPoolId=user_pool_id)
+                state[COGNITO_DOMAIN] = response.get("UserPool").get("Domain")
+            if RESOURCE_SERVER in types:
+                state[RESOURCE_SERVER] = dict(
+                    (server["Identifier"], server)
+                    for server in self._paginate(target, client.list_resource_servers, "ResourceServers",
+                                                 UserPoolId=user_pool_id, MaxResults=50))
+        except Exception as err:
+            logger.error("unable to scan {}/{}: {}".format(region, user_pool_id, err))
+            return [_report(declaration, target, ERROR, Reason=str(err)) for declaration, _ in resources]
+
+        reports = []
+        for declaration, properties in resources:
+            try:
+                compare = {
+                    COGNITO_DOMAIN: self._compare_domain,
+                    RESOURCE_SERVER: self._compare_resource_server,
+                    USER_POOL_CLIENT: self._compare_user_pool_client,
+                }[declaration["Type"]]
+                reports.append(compare(client, declaration, properties, target, state[declaration["Type"]]))
+            except Exception as err:
+                logger.error("unable to compare {}: {}".format(declaration.get("LogicalResourceId"), err))
+                reports.append(_report(declaration, target, ERROR, Reason=str(err)))
+        return reports
+
+    def _compare_domain(self, client, declaration, properties, target, domain):
+        expected = resource_models.cognito_domain(properties)
+        if domain is None:
+            return _report(declaration, target, MISSING)
+        return _report_differences(declaration, target, expected, {"Domain": domain})
+
+    def _compare_resource_server(self, client, declaration, properties, target, servers):
+        expected = resource_models.resource_server(properties)
+        actual = servers.get(expected["Identifier"])
+        if actual is None:
+            return _report(declaration, target, MISSING)
+        return _report_differences(declaration, target, expected, actual)
+
+    def _compare_user_pool_client(self, client, declaration, properties, target, _):
+        expected = resource_models.user_pool_client(properties)
+        if not declaration.get("PhysicalResourceId"):
+            return _report(declaration, target, ERROR, Reason="PhysicalResourceId is required for app clients")
+
+        client_ids = resource_models.user_pool_client_ids(declaration["PhysicalResourceId"],
+                                                          pool_targets.get_targets(properties))
+        client_id = client_ids.get(target["UserPoolId"])
+        if client_id is None:
+            return _report(declaration, target, MISSING)
+
+        try:
+            response = self._call(target, client.describe_user_pool_client,
+                                  UserPoolId=target["UserPoolId"], ClientId=client_id)
+        except client.exceptions.ResourceNotFoundException:
+            return _report(declaration, target, MISSING, ClientId=client_id)
+
+        differences = _differences(expected, response.get("UserPoolClient"))
+        status = MODIFIED if differences else IN_SYNC
+        return _report(declaration, target, status, ClientId=client_id, Differences=differences)
+
+    def _limiter(self, target):
+        key = (target["RoleArn"], target["CognitoRegion"])
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = RateLimiter(self._rate)
+                self._limiters[key] = limiter
+        return limiter
+
+    def _call(self, target, func, **kwargs):
+        self._limiter(target).acquire()
+        return func(**kwargs)
+
+    def _paginate(self, target, func, key, **kwargs):
+        while True:
+            response = self._call(target, func, **kwargs)
+            for item in response.get(key, []):
+                yield item
+            if not response.get("NextToken"):
+                return
+            kwargs["NextToken"] = response["NextToken"]
+
+
+def _report(declaration, target, status, **kwargs):
+    report = {
+        "LogicalResourceId": declaration.get("LogicalResourceId"),
+        "Type": declaration.get("Type"),
+        "CognitoRegion": target.get("CognitoRegion"),
+        "UserPoolId": target.get("UserPoolId"),
+        "Status": status,
+    }
+    report.update(kwargs)
+    return report
+
+
+def _report_differences(declaration, target, expected, actual):
+    differences = _differences(expected, actual)
+    status = MODIFIED if differences else IN_SYNC
+    return _report(declaration, target, status, Differences=differences)
+
+
+def _differences(expected, actual):
+    return [
+        {"Property": name, "Expected": value, "Actual": actual.get(name)}
+        for name, value in expected.items()
+        if _normalise(value) != _normalise(actual.get(name))
+    ]
+
+
+def _normalise(value):
+    # Cognito does not preserve the order of lists such as scopes and flows
+    if isinstance(value, list):
+        return sorted((_normalise(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, dict):
+        return dict((key, _normalise(item)) for key, item in value.items())
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report drift of declared Cognito resources.")
+    parser.add_argument("declarations", help="JSON file with the declared resources, - for stdin")
+    parser.add_argument("--max-workers", type=int, default=16, help="user pools scanned concurrently")
+    parser.add_argument("--rate", type=float, default=5, help="Cognito calls per second, role and region")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.declarations == "-":
+        declarations = json.load(sys.stdin)
+    else:
+        with open(args.declarations) as declarations_file:
+            declarations = json.load(declarations_file)
+
+    in_sync = True
+    scanner = DriftScanner(max_workers=args.max_workers, rate=args.rate)
+    for report in scanner.scan(declarations):
+        in_sync = in_sync and report["Status"] == IN_SYNC
+        sys.stdout.write(json.dumps(report, default=str) + "\n")
+        sys.stdout.flush()
+
+    return 0 if in_sync else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+import credential_cache
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the number of user pools that are worked on at the same time
+MAX_WORKERS = 8
+
+SUCCESS = 'SUCCESS'
+FAILED = 'FAILED'
+ROLLED_BACK = 'ROLLED_BACK'
+ROLLBACK_FAILED = 'ROLLBACK_FAILED'
+
+# Fields of a result that are returned in the Targets attribute of Data, a
+# CloudFormation response is limited to 4096 bytes. The full reasons are
+# part of the Reason of the response.
+OUTCOME_FIELDS = ("UserPoolId", "ClientId", "Status", "Reason")
+MAX_REASON_LENGTH = 64
+
+# Regional clients are kept for the lifetime of the container so warm
+# invocations do not pay for client creation again.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_targets(resource_properties):
+    """
+    Returns the user pools a custom resource applies to.
+
+    When the `Targets` property is set, every entry is expected to carry its
+    own `CognitoRegion` and `UserPoolId`. Otherwise the scalar `CognitoRegion`
+    and `UserPoolId` properties describe a single target. A `RoleArn` on a
+    target overrides the `RoleArn` of the resource.
+    """
+    role_arn = resource_properties.get("RoleArn")
+    targets = resource_properties.get("Targets")
+    if not targets:
+        targets = [resource_properties]
+
+    return [
+        {
+            "CognitoRegion": target.get("CognitoRegion"),
+            "UserPoolId": target.get("UserPoolId"),
+            "RoleArn": target.get("RoleArn", role_arn)
+        }
+        for target in targets
+    ]
+
+
+def get_client(region, role_arn=None, service_name="cognito-idp"):
+    """
+    Returns a cached client of the service (cognito-idp by default) for the
+    given region. If a role arn is given, the client uses the credentials of
+    that role, it is rebuilt whenever the cached role credentials are
+    refreshed.
+    """
+    credentials = None
+    if role_arn:
+        credentials = credential_cache.default_cache.get(role_arn, region)
+
+    with _clients_lock:
+        access_key_id, client = _clients.get((service_name, region, role_arn), (None, None))
+        if client is None or (credentials and credentials["AccessKeyId"] != access_key_id):
+            # the default boto3 session is not thread safe, so clients are
+            # created while holding the lock
+            if credentials:
+                access_key_id = credentials["AccessKeyId"]
+                client = boto3.client(
+                    service_name,
+                    region_name=region,
+                    aws_access_key_id=credentials["AccessKeyId"],
+                    aws_secret_access_key=credentials["SecretAccessKey"],
+                    aws_session_token=credentials["SessionToken"]
+                )
+            else:
+                client = boto3.client(service_name, region_name=region)
+            _clients[(service_name, region, role_arn)] = (access_key_id, client)
+    return client
+
+
+def apply(targets, action, rollback=None):
+    """
+    Runs `action(client, target)` against every target concurrently.
+
+    The return value of `action` is expected to be a dict (or None) that is
+    merged into the per-target result. If any target fails and a `rollback`
+    function is given, `rollback(client, result)` is called for every target
+    that succeeded. Results are returned in the order of `targets`.
+    """
+    results = _map(targets, lambda target: _run(action, target))
+
+    if rollback is not None and has_failures(results):
+        succeeded = [result for result in results if result["Status"] == SUCCESS]
+        _map(succeeded, lambda result: _rollback(rollback, result))
+
+    return results
+
+
+def has_failures(results):
+    return any(result["Status"] != SUCCESS for result in results)
+
+
+def raise_for_failures(results, message):
+    """
+    Raises a ValueError describing every failed target, if there are any.
+    """
+    failures = [
+        "{}/{}: {}".format(result["CognitoRegion"], result["UserPoolId"], result["Reason"])
+        for result in results
+        if result["Status"] == FAILED
+    ]
+    if failures:
+        raise ValueError("{}: {}".format(message, "; ".join(failures)))
+
+
+def outcomes(results):
+    """
+    Returns the outcome of every target for the Targets attribute of Data.
+    Anything else a result holds, e.g. the exported attributes and secrets of
+    app clients, is left out and long reasons are cut.
+    """
+    outcomes = []
+    for result in results:
+        outcome = dict((name, result[name]) for name in OUTCOME_FIELDS if name in result)
+        if len(outcome.get("Reason", "")) > MAX_REASON_LENGTH:
+            outcome["Reason"] = outcome["Reason"][:MAX_REASON_LENGTH] + "..."
+        outcomes.append(outcome)
+    return outcomes
+
+
+def _map(items, func):
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def _run(action, target):
+    result = dict(target)
+    try:
+        client = get_client(target["CognitoRegion"], target.get("RoleArn"))
+        result.update(action(client, target) or {})
+        result["Status"] = SUCCESS
+    except Exception as err:
+        logger.error("exception occured in {}/{}: {}".format(
+            target["CognitoRegion"], target["UserPoolId"], err))
+        result["Status"] = FAILED
+        result["Reason"] = str(err)
+    return result
+
+
+def _rollback(rollback, result):
+    try:
+        rollback(get_client(result["CognitoRegion"], result.get("RoleArn")), result)
+        result["Status"] = ROLLED_BACK
+    except Exception as err:
+        logger.error("rollback failed in {}/{}: {}".format(
+            result["CognitoRegion"], result["UserPoolId"], err))
+        result["Status"] = ROLLBACK_FAILED
+        result["Reason"] = str(err)
+    return result
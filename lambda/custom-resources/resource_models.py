@@ -0,0 +1,52 @@
+"""
+Desired state of the Cognito resources managed by the custom resources.
+
+Each function maps validated ResourceProperties (see schemas.py) to the
+attributes the handlers send to Cognito. The drift scanner compares the same
+attributes against the live user pools.
+"""
+
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+
+def cognito_domain(resource_properties):
+    return {
+        "Domain": resource_properties.get("CognitoDomainPrefix")
+    }
+
+
+def resource_server(resource_properties):
+    return {
+        "Identifier": resource_properties.get("Identifier"),
+        "Name": resource_properties.get("Name"),
+        "Scopes": resource_properties.get("Scopes")
+    }
+
+
+def user_pool_client(resource_properties):
+    """
+    Attributes shared by create_user_pool_client and update_user_pool_client.
+    """
+    return {
+        "ClientName": resource_properties.get("AppClientName"),
+        "RefreshTokenValidity": 30,
+        "AllowedOAuthFlows": [
+            'client_credentials',
+        ],
+        "AllowedOAuthScopes": [
+            resource_properties.get("CustomScope")
+        ],
+        "AllowedOAuthFlowsUserPoolClient": True
+    }
+
+
+def user_pool_client_ids(physical_resource_id, targets):
+    """
+    Returns a dict of user pool id to client id.
+    A single target uses the plain client id as its physical id, multiple
+    targets use a comma separated list of `UserPoolId/ClientId` pairs.
+    """
+    if "/" not in physical_resource_id:
+        return {targets[0]["UserPoolId"]: physical_resource_id}
+    return dict(pair.split("/", 1) for pair in physical_resource_id.split(","))
@@ -1,41 +1,46 @@
 __version__ = '0.1.0'
 __version_info__ = tuple([int(num) for num in __version__.split('.')])
 
-import boto3
 from crhelper import CfnResource
 import logging
+import pool_targets
+import resource_models
+import schemas
 
 
 logger = logging.getLogger(__name__)
 # Initialise the helper, all inputs are optional, this example shows the defaults
 helper = CfnResource(json_logging=False, log_level='DEBUG', boto_level='CRITICAL')
+helper.validate(schemas.RESOURCE_SERVER.validate)
+helper.validate_delete(schemas.RESOURCE_SERVER.validate_delete)
 
 @helper.create
 def create(event, context):
     """
-    Creates a custom resource server to manage oauth scopes
+    Creates a custom resource server to manage oauth scopes.
+    The resource server is created in every target user pool at once. If any
+    of the pools fails, the resource server is removed from the pools that
+    succeeded.
 
     """
     logger.debug("Creating resource server..")
 
-    user_pool_id = event["ResourceProperties"].get("UserPoolId")
-    identifier = event["ResourceProperties"].get("Identifier")
-    name = event["ResourceProperties"].get("Name")
-    scopes = event["ResourceProperties"].get("Scopes")
-    cognito_region = event["ResourceProperties"].get("CognitoRegion")
+    resource_properties = event["ResourceProperties"]
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    settings = resource_models.resource_server(resource_properties)
+    identifier = settings["Identifier"]
+    targets = pool_targets.get_targets(resource_properties)
 
-    try:
+    def create_resource_server(client, target):
         client.create_resource_server(
-            UserPoolId=user_pool_id,
-            Identifier=identifier,
-            Name=name,
-            Scopes=scopes
+            UserPoolId=target["UserPoolId"],
+            **settings
         )
-    except Exception as err:
-        logger.error("exception occured: {}".format(err))
-        raise ValueError("unable to create resource server: {}".format(err))
+
+    results = pool_targets.apply(targets, create_resource_server,
+                                 rollback=_delete_resource_server(identifier))
+    helper.Data["Targets"] = pool_targets.outcomes(results)
+    pool_targets.raise_for_failures(results, "unable to create resource server")
 
     logger.debug("Finished creating resource server..")
 
@@ -45,39 +50,60 @@ def create(event, context):
 @helper.update
 def update(event, context):
     """
-    Update a custom resource server with custom scopes
+    Update a custom resource server with custom scopes.
+    User pools that were dropped from the targets have their resource
+    server deleted.
 
     """
     logger.debug("Updating resource server..")
 
-    user_pool_id = event["ResourceProperties"].get("UserPoolId")
-    identifier = event["ResourceProperties"].get("Identifier")
-    name = event["ResourceProperties"].get("Name")
-    scopes = event["ResourceProperties"].get("Scopes")
-    cognito_region = event["ResourceProperties"].get("CognitoRegion")
-
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    resource_properties = event["ResourceProperties"]
+
+    settings = resource_models.resource_server(resource_properties)
+    identifier = settings["Identifier"]
+    targets = pool_targets.get_targets(resource_properties)
+
+    def update_resource_server(client, target):
+        user_pool_id = target["UserPoolId"]
+        try:
+            client.describe_resource_server(
+                UserPoolId=user_pool_id,
+                Identifier=identifier
+            )
+        except Exception:
+            logger.debug("Resource server {} does not exist in User pool {}."
+                         .format(identifier, user_pool_id))
+            client.create_resource_server(
+                UserPoolId=user_pool_id,
+                **settings
+            )
+            return {"Created": True}
 
-    try:
-        client.describe_resource_server(
-            UserPoolId=user_pool_id,
-            Identifier=identifier
-        )
         client.update_resource_server(
             UserPoolId=user_pool_id,
-            Identifier=identifier,
-            Name=name,
-            Scopes=scopes
-        )
-    except Exception:
-        logger.debug("Resource server {} does not exist in User pool {}."
-                     .format(identifier, user_pool_id))
-        client.create_resource_server(
-            UserPoolId=user_pool_id,
-            Identifier=identifier,
-            Name=name,
-            Scopes=scopes
+            **settings
         )
+        return {"Created": False}
+
+    def rollback_update(client, result):
+        # only undo resource servers this update created, the ones that were
+        # updated in place are restored by the CloudFormation rollback
+        if result.get("Created"):
+            _delete_resource_server(identifier)(client, result)
+
+    results = pool_targets.apply(targets, update_resource_server,
+                                 rollback=rollback_update)
+    helper.Data["Targets"] = pool_targets.outcomes(results)
+    pool_targets.raise_for_failures(results, "unable to update resource server")
+
+    old_targets = pool_targets.get_targets(event.get("OldResourceProperties", {}))
+    user_pool_ids = [target["UserPoolId"] for target in targets]
+    removed_targets = [target for target in old_targets
+                       if target["UserPoolId"] not in user_pool_ids]
+    if removed_targets:
+        results = pool_targets.apply(removed_targets,
+                                     _delete_resource_server(event['PhysicalResourceId']))
+        pool_targets.raise_for_failures(results, "unable to delete resource server")
 
     physical_resource_id = event['PhysicalResourceId']
     return physical_resource_id
@@ -86,48 +112,49 @@ def update(event, context):
 @helper.delete
 def delete(event, context):
     """
-    Delete a resource server.
+    Delete a resource server from every target user pool.
 
     """
     logger.debug("Deleting resource server..")
 
-    user_pool_id = event["ResourceProperties"].get("UserPoolId")
     identifier = event['PhysicalResourceId']
-    cognito_region = event["ResourceProperties"].get("CognitoRegion")
+    targets = pool_targets.get_targets(event["ResourceProperties"])
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
-
-    logger.debug("user_pool_id: {}".format(user_pool_id))
     logger.debug("identifier: {}".format(identifier))
-    logger.debug("cognito_region: {}".format(cognito_region))
+    logger.debug("targets: {}".format(targets))
 
-    try:
-        logger.debug("Describing resource server..")
-        client.describe_resource_server(
-            UserPoolId=user_pool_id,
-            Identifier=identifier
-        )
-
-    except Exception:
-        logger.debug("Unable to find resource server to delete. identifier: {}"
-                     .format(identifier))
-        return
-
-    client.delete_resource_server(
-        UserPoolId=user_pool_id,
-        Identifier=identifier
-    )
+    results = pool_targets.apply(targets, _delete_resource_server(identifier))
+    helper.Data["Targets"] = pool_targets.outcomes(results)
+    pool_targets.raise_for_failures(results, "unable to delete resource server")
 
     logger.debug("Finished deleting resource server..")
 
     return
 
-@helper.poll_create
-def poll_create(event, context):
-    logger.info("Create polling..")
-    # Return a resource id or True to indicate that creation is complete. if True is returned an id
-    # will be generated
-    return True
+def _delete_resource_server(identifier):
+    """
+    Returns a pool_targets action that deletes the resource server, if it
+    still exists in the target user pool.
+    """
+    def delete_resource_server(client, target):
+        user_pool_id = target["UserPoolId"]
+        try:
+            logger.debug("Describing resource server..")
+            client.describe_resource_server(
+                UserPoolId=user_pool_id,
+                Identifier=identifier
+            )
+        except Exception:
+            logger.debug("Unable to find resource server to delete. identifier: {}, user pool: {}"
+                         .format(identifier, user_pool_id))
+            return
+
+        client.delete_resource_server(
+            UserPoolId=user_pool_id,
+            Identifier=identifier
+        )
+
+    return delete_resource_server
 
 def handler(event, context):
     """
@@ -0,0 +1,241 @@
+"""
+Schemas of the ResourceProperties accepted by the custom resources.
+
+The schemas are compiled into plain validator functions when this module is
+imported, so validating an event does not do any parsing or regex
+compilation. Validation returns a copy of the properties with every known
+field checked and coerced, unknown fields (ServiceToken, loglevel, ..) are
+passed through unchanged.
+"""
+
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+import fnmatch
+import os
+import re
+from urllib.parse import urlparse
+
+
+class Schema(object):
+
+    def __init__(self, fields, required=(), required_one_of=(), locate=()):
+        self._validate = _object(fields, required, required_one_of)
+        # a delete only needs the fields that locate the resource, anything
+        # else the schema is stricter about must not keep it from being deleted
+        self._validate_delete = _object(
+            dict((name, fields[name]) for name in locate),
+            [name for name in required if name in locate],
+            [group for group in required_one_of if all(name in locate for name in group)])
+
+    def validate(self, properties):
+        """
+        Returns the validated properties, raises a ValueError describing the
+        first invalid field otherwise.
+        """
+        return self._validate(properties, "ResourceProperties")
+
+    def validate_delete(self, properties):
+        """
+        Like validate, but only checks the fields needed to locate the
+        resource that is deleted.
+        """
+        return self._validate_delete(properties, "ResourceProperties")
+
+
+def _string(pattern=None, min_length=1, max_length=None):
+    regex = re.compile(pattern) if pattern else None
+
+    def validate(value, path):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            raise ValueError("{} must be a string".format(path))
+        if len(value) < min_length:
+            raise ValueError("{} must not be empty".format(path))
+        if max_length is not None and len(value) > max_length:
+            raise ValueError("{} must be at most {} characters".format(path, max_length))
+        if regex is not None and not regex.fullmatch(value):
+            raise ValueError("{} is invalid: '{}' does not match {}".format(path, value, pattern))
+        return value
+
+    return validate
+
+
+def _integer(minimum=None, maximum=None):
+
+    def validate(value, path):
+        if isinstance(value, bool):
+            raise ValueError("{} must be an integer".format(path))
+        try:
+            # CloudFormation passes numbers as strings
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("{} must be an integer".format(path))
+        if minimum is not None and value < minimum:
+            raise ValueError("{} must be at least {}".format(path, minimum))
+        if maximum is not None and value > maximum:
+            raise ValueError("{} must be at most {}".format(path, maximum))
+        return value
+
+    return validate
+
+
+def _list(item, min_items=0, max_items=None):
+
+    def validate(value, path):
+        if not isinstance(value, list):
+            raise ValueError("{} must be a list".format(path))
+        if len(value) < min_items:
+            raise ValueError("{} must have at least {} item(s)".format(path, min_items))
+        if max_items is not None and len(value) > max_items:
+            raise ValueError("{} must have at most {} items".format(path, max_items))
+        return [item(element, "{}[{}]".format(path, index)) for index, element in enumerate(value)]
+
+    return validate
+
+
+def _object(fields, required=(), required_one_of=()):
+    fields = list(fields.items())
+    required = tuple(required)
+    required_one_of = tuple(tuple(group) for group in required_one_of)
+
+    def validate(value, path):
+        if not isinstance(value, dict):
+            raise ValueError("{} must be an object".format(path))
+        for name in required:
+            if value.get(name) in (None, ""):
+                raise ValueError("{}.{} is required".format(path, name))
+        if required_one_of and not any(
+                all(value.get(name) not in (None, "") for name in group) for group in required_one_of):
+            raise ValueError("{} requires one of: {}".format(
+                path, " or ".join("+".join(group) for group in required_one_of)))
+        result = dict(value)
+        for name, field in fields:
+            if value.get(name) is not None:
+                result[name] = field(value[name], "{}.{}".format(path, name))
+        return result
+
+    return validate
+
+
+def _one_of(values, description):
+    values = frozenset(values)
+
+    def validate(value, path):
+        if value not in values:
+            raise ValueError("{} is not a {}: '{}'".format(path, description, value))
+        return value
+
+    return validate
+
+
+def _matching(item, patterns, description):
+    """
+    Accepts only values matching one of the IAM style wildcard patterns.
+    """
+    regex = re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns)) if patterns else None
+
+    def validate(value, path):
+        value = item(value, path)
+        if regex is None or not regex.match(value):
+            raise ValueError("{} is not an allowed {}: '{}'".format(path, description, value))
+        return value
+
+    return validate
+
+
+# Roles the custom resources may assume through RoleArn, a comma separated
+# list of IAM style patterns set from the AllowedRoleArns template parameter.
+# No role may be assumed when it is not set.
+ALLOWED_ROLE_ARNS = [pattern.strip() for pattern in os.getenv("ALLOWED_ROLE_ARNS", "").split(",")
+                     if pattern.strip()]
+
+# Parameter path the ssm ExportSink may write below, set from the
+# ExportParameterPrefix template parameter. ssm sinks are rejected when it is
+# not set.
+EXPORT_PARAMETER_PREFIX = os.getenv("EXPORT_PARAMETER_PREFIX", "").rstrip("/")
+
+
+def _export_sink(prefix):
+    item = _string(r"^[a-z][a-z0-9+.-]*://.*$")
+
+    def validate(value, path):
+        value = item(value, path)
+        uri = urlparse(value)
+        if uri.scheme == "ssm" and not (prefix and "{}/".format(uri.path.rstrip("/")).startswith(prefix + "/")):
+            raise ValueError("{} must be below the parameter path {}: '{}'".format(
+                path, prefix or "(see EXPORT_PARAMETER_PREFIX)", value))
+        return value
+
+    return validate
+
+
+_REGION = _string(r"^[a-z]{2}(-[a-z]+)+-\d+$")
+_USER_POOL_ID = _string(r"^[\w-]+_[0-9a-zA-Z]+$", max_length=55)
+_ROLE_ARN = _string(r"^arn:aws[\w-]*:iam::\d{12}:role/[\w+=,.@/-]+$", max_length=2048)
+_ASSUMED_ROLE_ARN = _matching(_ROLE_ARN, ALLOWED_ROLE_ARNS, "role (see ALLOWED_ROLE_ARNS)")
+_NAME = _string(r"^[\w\s+=,.@-]+$", max_length=256)
+_SCOPE_NAME = _string(r"^[\x21\x23-\x2E\x30-\x5B\x5D-\x7E]+$", max_length=256)
+
+# Members of the UserPoolClientType returned by describe_user_pool_client
+USER_POOL_CLIENT_ATTRIBUTES = [
+    "UserPoolId", "ClientName", "ClientId", "ClientSecret", "LastModifiedDate", "CreationDate",
+    "RefreshTokenValidity", "AccessTokenValidity", "IdTokenValidity", "TokenValidityUnits",
+    "ReadAttributes", "WriteAttributes", "ExplicitAuthFlows", "SupportedIdentityProviders",
+    "CallbackURLs", "LogoutURLs", "DefaultRedirectURI", "AllowedOAuthFlows", "AllowedOAuthScopes",
+    "AllowedOAuthFlowsUserPoolClient", "AnalyticsConfiguration", "PreventUserExistenceErrors",
+    "EnableTokenRevocation", "EnablePropagateAdditionalUserContextData", "AuthSessionValidity",
+]
+
+_TARGET = _object({
+    "CognitoRegion": _REGION,
+    "UserPoolId": _USER_POOL_ID,
+    "RoleArn": _ASSUMED_ROLE_ARN,
+}, required=("CognitoRegion", "UserPoolId"))
+
+# Fields that identify the user pool(s) a custom resource applies to
+_POOL_FIELDS = {
+    "CognitoRegion": _REGION,
+    "UserPoolId": _USER_POOL_ID,
+    "RoleArn": _ASSUMED_ROLE_ARN,
+    "Targets": _list(_TARGET, min_items=1),
+}
+_POOL_REQUIRED = (("Targets",), ("CognitoRegion", "UserPoolId"))
+_POOL_LOCATE = tuple(_POOL_FIELDS)
+
+COGNITO_DOMAIN = Schema({
+    "CognitoRegion": _REGION,
+    "UserPoolId": _USER_POOL_ID,
+    "RoleArn": _ASSUMED_ROLE_ARN,
+    "CognitoDomainPrefix": _string(r"^[a-z0-9](?:[a-z0-9\-]{0,61}[a-z0-9])?$"),
+}, required=("CognitoRegion", "UserPoolId", "CognitoDomainPrefix"),
+    locate=("CognitoRegion", "UserPoolId", "RoleArn", "CognitoDomainPrefix"))
+
+RESOURCE_SERVER = Schema(dict(_POOL_FIELDS, **{
+    "Identifier": _string(r"^[\x21\x23-\x5B\x5D-\x7E]+$", max_length=256),
+    "Name": _NAME,
+    "Scopes": _list(_object({
+        "ScopeName": _SCOPE_NAME,
+        "ScopeDescription": _string(max_length=256),
+    }, required=("ScopeName", "ScopeDescription")), max_items=100),
+}), required=("Identifier", "Name", "Scopes"), required_one_of=_POOL_REQUIRED, locate=_POOL_LOCATE)
+
+USER_POOL_CLIENT = Schema(dict(_POOL_FIELDS, **{
+    "AppClientName": _string(r"^[\w\s+=,.@-]+$", max_length=128),
+    "CustomScope": _string(r"^\S+/[\x21\x23-\x2E\x30-\x5B\x5D-\x7E]+$", max_length=256),
+    "ExportAttributes": _list(_one_of(USER_POOL_CLIENT_ATTRIBUTES, "UserPoolClient attribute")),
+    "ExportSink": _export_sink(EXPORT_PARAMETER_PREFIX),
+}), required=("AppClientName", "CustomScope"), required_one_of=_POOL_REQUIRED,
+    locate=_POOL_LOCATE + ("ExportSink",))
+
+USER_IMPORT = Schema({
+    "CognitoRegion": _REGION,
+    "UserPoolId": _USER_POOL_ID,
+    "RoleArn": _ASSUMED_ROLE_ARN,
+    "CloudWatchLogsRoleArn": _ROLE_ARN,
+    "UserSource": _string(r"^(s3://[^/]+/.+|file://.+|/.+)$"),
+    # a single import job accepts up to 500,000 users
+    "ChunkSize": _integer(minimum=1, maximum=500000),
+}, required=("CognitoRegion", "UserPoolId", "CloudWatchLogsRoleArn", "UserSource"),
+    locate=("CognitoRegion", "UserPoolId", "RoleArn", "UserSource"))
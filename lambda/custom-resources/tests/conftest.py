@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The modules are imported the way the Lambda runtime imports them, from the
+# custom-resources folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AWS_REGION", "us-east-1")
+# keeps crhelper from creating the lambda/events/logs clients of the handlers
+os.environ.setdefault("AWS_SAM_LOCAL", "true")
+os.environ.setdefault("ALLOWED_ROLE_ARNS", "arn:aws:iam::*:role/cognito-custom-resources-*")
+os.environ.setdefault("EXPORT_PARAMETER_PREFIX", "/cognito-custom-resources")
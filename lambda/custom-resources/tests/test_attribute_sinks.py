@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import attribute_sinks
+
+
+def read(path):
+    with open(path) as sink_file:
+        return json.load(sink_file)["UserPoolClients"]
+
+
+def record(user_pool_id, client_id, **attributes):
+    return dict(attributes, UserPoolId=user_pool_id, ClientId=client_id)
+
+
+def test_file_sink_writes_the_records(tmp_path):
+    path = tmp_path / "clients.json"
+    sink = attribute_sinks.get_sink("file://{}".format(path))
+
+    sink.write([record("us-east-1_aaa", "client1"), record("us-west-2_bbb", "client2")])
+
+    assert read(path) == [record("us-east-1_aaa", "client1"), record("us-west-2_bbb", "client2")]
+    assert not (tmp_path / "clients.json.tmp").exists()
+
+
+def test_file_sink_merges_records_by_client_id(tmp_path):
+    path = tmp_path / "clients.json"
+    sink = attribute_sinks.get_sink("file://{}".format(path))
+    sink.write([record("us-east-1_aaa", "client1", ClientName="internal")])
+    sink.write([record("us-east-1_aaa", "client2", ClientName="external")])
+
+    sink.write([record("us-east-1_aaa", "client1", ClientName="renamed")])
+
+    assert read(path) == [
+        record("us-east-1_aaa", "client2", ClientName="external"),
+        record("us-east-1_aaa", "client1", ClientName="renamed"),
+    ]
+
+
+def test_file_sink_deletes_only_the_given_clients(tmp_path):
+    path = tmp_path / "clients.json"
+    sink = attribute_sinks.get_sink("file://{}".format(path))
+    sink.write([record("us-east-1_aaa", "client1"), record("us-east-1_aaa", "client2")])
+
+    sink.delete([record("us-east-1_aaa", "client1"), record("us-east-1_aaa", "client3")])
+    assert read(path) == [record("us-east-1_aaa", "client2")]
+
+    sink.delete([record("us-east-1_aaa", "client2")])
+    assert not path.exists()
+    # deleting from a missing file is a no-op
+    sink.delete([record("us-east-1_aaa", "client2")])
+
+
+def test_unknown_schemes_are_rejected():
+    with pytest.raises(ValueError) as error:
+        attribute_sinks.get_sink("s3://bucket/clients.json")
+
+    assert str(error.value) == "unsupported ExportSink: s3://bucket/clients.json"
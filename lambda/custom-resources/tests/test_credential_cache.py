@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from credential_cache import CredentialCache
+
+ROLE_ARN = "arn:aws:iam::123456789012:role/cognito-custom-resources-test"
+
+
+class FakeClock(object):
+
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSts(object):
+    """
+    Local STS stand-in, every assume_role call returns new credentials that
+    expire after DurationSeconds.
+    """
+
+    def __init__(self, clock, delay=0):
+        self.clock = clock
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def assume_role(self, RoleArn, RoleSessionName, DurationSeconds):
+        with self._lock:
+            self.calls.append(RoleArn)
+            number = len(self.calls)
+        # gives concurrent callers the chance to pile up on the same key
+        time.sleep(self.delay)
+        return {
+            "Credentials": {
+                "AccessKeyId": "AKID{}".format(number),
+                "SecretAccessKey": "secret",
+                "SessionToken": "token",
+                "Expiration": self.clock() + DurationSeconds,
+            }
+        }
+
+
+def _cache(clock, sts, **kwargs):
+    return CredentialCache(sts_client_factory=lambda region: sts, clock=clock, **kwargs)
+
+
+def test_credentials_are_cached_until_the_refresh_window():
+    clock = FakeClock()
+    sts = FakeSts(clock)
+    cache = _cache(clock, sts, refresh_window=300, session_duration=3600)
+
+    first = cache.get(ROLE_ARN, "us-east-1")
+    clock.now += 3600 - 301
+    assert cache.get(ROLE_ARN, "us-east-1") is first
+    assert len(sts.calls) == 1
+
+
+def test_credentials_are_refreshed_before_they_expire():
+    clock = FakeClock()
+    sts = FakeSts(clock)
+    cache = _cache(clock, sts, refresh_window=300, session_duration=3600)
+
+    first = cache.get(ROLE_ARN, "us-east-1")
+    # still valid for another 299 seconds, but within the refresh window
+    clock.now += 3600 - 299
+    second = cache.get(ROLE_ARN, "us-east-1")
+
+    assert second["AccessKeyId"] != first["AccessKeyId"]
+    assert len(sts.calls) == 2
+
+
+def test_credentials_are_cached_per_role_and_region():
+    clock = FakeClock()
+    sts = FakeSts(clock)
+    cache = _cache(clock, sts)
+
+    cache.get(ROLE_ARN, "us-east-1")
+    cache.get(ROLE_ARN, "us-west-2")
+    cache.get(ROLE_ARN + "-other", "us-east-1")
+    cache.get(ROLE_ARN, "us-east-1")
+
+    assert len(sts.calls) == 3
+
+
+def test_concurrent_callers_share_one_assume_role_call_per_key():
+    clock = FakeClock()
+    sts = FakeSts(clock, delay=0.05)
+    cache = _cache(clock, sts)
+    keys = [(ROLE_ARN, "us-east-1"), (ROLE_ARN, "us-west-2")] * 16
+
+    with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+        credentials = list(executor.map(lambda key: cache.get(*key), keys))
+
+    assert len(sts.calls) == 2
+    assert len(set(item["AccessKeyId"] for item in credentials)) == 2
+
+
+def test_expiration_may_be_a_datetime():
+    import datetime
+
+    clock = FakeClock()
+    sts = FakeSts(clock)
+    expiration = datetime.datetime.utcfromtimestamp(clock.now + 3600)
+    sts.assume_role = lambda **kwargs: {"Credentials": {"AccessKeyId": "AKID", "Expiration": expiration}}
+    cache = _cache(clock, sts)
+
+    assert cache.get(ROLE_ARN, "us-east-1") is cache.get(ROLE_ARN, "us-east-1")
@@ -0,0 +1,207 @@
+import drift_scanner
+from drift_scanner import DriftScanner, RateLimiter
+
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class FakeCognito(object):
+    """
+    cognito-idp stand-in for a single user pool, list_resource_servers
+    returns `page_size` servers per page.
+    """
+
+    class exceptions(object):
+        ResourceNotFoundException = ResourceNotFoundException
+
+    def __init__(self, domain=None, servers=(), clients=None, page_size=2, error=None):
+        self.domain = domain
+        self.servers = list(servers)
+        self.clients = clients or {}
+        self.page_size = page_size
+        self.error = error
+        self.calls = []
+
+    def describe_user_pool(self, UserPoolId):
+        self.calls.append(("describe_user_pool", None))
+        if self.error:
+            raise self.error
+        return {"UserPool": {"Id": UserPoolId, "Domain": self.domain}}
+
+    def list_resource_servers(self, UserPoolId, MaxResults, NextToken=None):
+        self.calls.append(("list_resource_servers", NextToken))
+        if self.error:
+            raise self.error
+        start = int(NextToken or 0)
+        response = {"ResourceServers": self.servers[start:start + self.page_size]}
+        if start + self.page_size < len(self.servers):
+            response["NextToken"] = str(start + self.page_size)
+        return response
+
+    def describe_user_pool_client(self, UserPoolId, ClientId):
+        self.calls.append(("describe_user_pool_client", ClientId))
+        if ClientId not in self.clients:
+            raise ResourceNotFoundException(ClientId)
+        return {"UserPoolClient": self.clients[ClientId]}
+
+
+POOL = {"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa"}
+
+SCOPES = [
+    {"ScopeName": "ddb.read", "ScopeDescription": "read"},
+    {"ScopeName": "ddb.write", "ScopeDescription": "write"},
+]
+
+
+def server(identifier, scopes=SCOPES, name="API"):
+    return {"UserPoolId": "us-east-1_aaa", "Identifier": identifier, "Name": name, "Scopes": list(scopes)}
+
+
+def app_client(client_id, scopes=("api/ddb.read",), name="internal"):
+    return {
+        "UserPoolId": "us-east-1_aaa", "ClientId": client_id, "ClientName": name,
+        "RefreshTokenValidity": 30, "AllowedOAuthFlows": ["client_credentials"],
+        "AllowedOAuthScopes": list(scopes), "AllowedOAuthFlowsUserPoolClient": True,
+    }
+
+
+def declare(logical_resource_id, resource_type, physical_resource_id=None, **properties):
+    declaration = {
+        "LogicalResourceId": logical_resource_id,
+        "Type": resource_type,
+        "Properties": dict(POOL, **properties),
+    }
+    if physical_resource_id:
+        declaration["PhysicalResourceId"] = physical_resource_id
+    return declaration
+
+
+def scan(cognito, declarations):
+    scanner = DriftScanner(client_factory=lambda region, role_arn: cognito, max_workers=2, rate=1000)
+    return dict((report["LogicalResourceId"], report) for report in scanner.scan(declarations))
+
+
+def test_resource_servers_are_listed_across_pages():
+    servers = [server("api{}".format(number)) for number in range(5)]
+    cognito = FakeCognito(servers=servers, page_size=2)
+
+    reports = scan(cognito, [declare("Last", "ResourceServer", Identifier="api4", Name="API", Scopes=SCOPES)])
+
+    assert reports["Last"]["Status"] == drift_scanner.IN_SYNC
+    assert cognito.calls == [("list_resource_servers", None), ("list_resource_servers", "2"),
+                             ("list_resource_servers", "4")]
+
+
+def test_reports_in_sync_modified_and_missing():
+    cognito = FakeCognito(
+        domain="auth-example",
+        servers=[server("api", name="Renamed")],
+        clients={"client1": app_client("client1"), "client2": app_client("client2", scopes=["api/ddb.write"])})
+
+    reports = scan(cognito, [
+        declare("Domain", "CognitoDomain", CognitoDomainPrefix="auth-example"),
+        declare("Server", "ResourceServer", Identifier="api", Name="API", Scopes=SCOPES),
+        declare("OtherServer", "ResourceServer", Identifier="other", Name="API", Scopes=SCOPES),
+        declare("Client", "UserPoolClient", "client1", AppClientName="internal", CustomScope="api/ddb.read"),
+        declare("Modified", "UserPoolClient", "client2", AppClientName="internal", CustomScope="api/ddb.read"),
+        declare("Deleted", "UserPoolClient", "client3", AppClientName="internal", CustomScope="api/ddb.read"),
+    ])
+
+    assert reports["Domain"]["Status"] == drift_scanner.IN_SYNC
+    assert reports["Server"]["Status"] == drift_scanner.MODIFIED
+    assert reports["Server"]["Differences"] == [{"Property": "Name", "Expected": "API", "Actual": "Renamed"}]
+    assert reports["OtherServer"]["Status"] == drift_scanner.MISSING
+    assert reports["Client"]["Status"] == drift_scanner.IN_SYNC
+    assert reports["Modified"]["Status"] == drift_scanner.MODIFIED
+    assert reports["Modified"]["Differences"] == [
+        {"Property": "AllowedOAuthScopes", "Expected": ["api/ddb.read"], "Actual": ["api/ddb.write"]}]
+    assert reports["Deleted"]["Status"] == drift_scanner.MISSING
+    assert reports["Deleted"]["ClientId"] == "client3"
+
+
+def test_missing_domain():
+    reports = scan(FakeCognito(domain=None), [declare("Domain", "CognitoDomain", CognitoDomainPrefix="auth")])
+
+    assert reports["Domain"]["Status"] == drift_scanner.MISSING
+
+
+def test_scopes_are_compared_regardless_of_order():
+    cognito = FakeCognito(
+        servers=[server("api", scopes=list(reversed(SCOPES)))],
+        clients={"client1": app_client("client1", scopes=["api/ddb.write", "api/ddb.read"])})
+    client = app_client("client1", scopes=["api/ddb.read", "api/ddb.write"])
+
+    reports = scan(cognito, [declare("Server", "ResourceServer", Identifier="api", Name="API", Scopes=SCOPES)])
+
+    assert reports["Server"]["Status"] == drift_scanner.IN_SYNC
+    assert drift_scanner._differences({"AllowedOAuthScopes": ["api/ddb.read", "api/ddb.write"]}, client) == []
+
+
+def test_reports_errors():
+    cognito = FakeCognito(error=Exception("Rate exceeded"))
+
+    reports = scan(cognito, [
+        declare("Unknown", "Bucket"),
+        declare("Invalid", "CognitoDomain", CognitoDomainPrefix="Not A Prefix"),
+        declare("Domain", "CognitoDomain", CognitoDomainPrefix="auth"),
+        declare("Client", "UserPoolClient", AppClientName="internal", CustomScope="api/ddb.read"),
+    ])
+
+    assert reports["Unknown"]["Status"] == drift_scanner.ERROR
+    assert reports["Unknown"]["Reason"] == "unknown resource type: Bucket"
+    assert reports["Invalid"]["Status"] == drift_scanner.ERROR
+    assert "CognitoDomainPrefix" in reports["Invalid"]["Reason"]
+    # the user pool could not be scanned, so every resource in it errors
+    assert reports["Domain"]["Status"] == drift_scanner.ERROR
+    assert reports["Domain"]["Reason"] == "Rate exceeded"
+    assert reports["Client"]["Status"] == drift_scanner.ERROR
+
+
+def test_app_clients_require_their_physical_id():
+    reports = scan(FakeCognito(), [
+        declare("Client", "UserPoolClient", AppClientName="internal", CustomScope="api/ddb.read")])
+
+    assert reports["Client"]["Status"] == drift_scanner.ERROR
+    assert reports["Client"]["Reason"] == "PhysicalResourceId is required for app clients"
+
+
+class FakeClock(object):
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_allows_a_burst_then_waits():
+    clock = FakeClock()
+    limiter = RateLimiter(2, burst=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+    assert clock.now == 1001.0
+
+
+def test_rate_limiter_refills_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(1, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire()
+    clock.now += 10
+    limiter.acquire()
+    # tokens are capped at the burst, so an idle limiter does not bank calls
+    limiter.acquire()
+
+    assert clock.sleeps == [1.0]
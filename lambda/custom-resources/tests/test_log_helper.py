@@ -0,0 +1,174 @@
+import functools
+import json
+import logging
+
+from crhelper import log_helper
+from crhelper import resource_helper
+
+SIGNED_URL = "https://cloudformation-custom-resource-response-useast1.s3.amazonaws.com/stack?X-Amz-Signature=abc123"
+
+
+class FakeLogger(object):
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.messages = []
+
+    def isEnabledFor(self, level):
+        return self.enabled
+
+    def debug(self, message):
+        self.messages.append(json.loads(message))
+
+
+def summary_logger(**kwargs):
+    log = FakeLogger()
+    return log_helper.EventSummaryLogger(log=log, **kwargs), log
+
+
+def test_sensitive_fields_are_redacted():
+    event_logger, _ = summary_logger()
+
+    summary = event_logger.summarise({
+        "ResponseURL": SIGNED_URL,
+        "ResourceProperties": {
+            "ClientSecret": "s3cr3t",
+            "Credentials": {"AccessKeyId": "AKID"},
+            "Tokens": ["token1", "token2"],
+            "AppClientName": "internal",
+        },
+    })
+
+    assert summary == {
+        "ResponseURL": SIGNED_URL.split("?")[0] + "?***",
+        "ResourceProperties": {
+            "ClientSecret": "***",
+            "Credentials": "***",
+            "Tokens": "***",
+            "AppClientName": "internal",
+        },
+    }
+
+
+def test_redact_url_keeps_urls_without_a_query_string():
+    assert log_helper.redact_url("https://example.com/path") == "https://example.com/path"
+    assert log_helper.redact_url(None) is None
+
+
+def test_long_fields_and_lists_are_shortened():
+    event_logger, _ = summary_logger(max_field_length=4)
+
+    summary = event_logger.summarise({"Name": "abcdefgh", "Items": list(range(12))})
+
+    assert summary == {"Name": "abcd... (4 more)", "Items": list(range(10)) + ["... (2 more)"]}
+
+
+def test_summaries_over_the_size_cap_keep_only_the_summary_fields():
+    event_logger, _ = summary_logger(max_size=200)
+    event = {
+        "RequestType": "Create",
+        "LogicalResourceId": "CognitoAppClient",
+        "ResourceProperties": {"Names": ["x" * 100] * 10},
+    }
+
+    assert event_logger.summarise(event) == {
+        "RequestType": "Create",
+        "LogicalResourceId": "CognitoAppClient",
+        "Truncated": True,
+    }
+    assert event_logger.summarise(["x" * 100] * 10) == {"Truncated": True}
+
+
+def test_sampling_is_decided_per_request():
+    rolls = iter([0.2, 0.7])
+    event_logger, log = summary_logger(sample_rate=0.5, rand=lambda: next(rolls))
+
+    assert event_logger.sample()
+    event_logger.log("Received event", {"RequestId": "1"})
+    event_logger.log("Sending response", {"RequestId": "1"})
+    assert not event_logger.sample()
+    event_logger.log("Received event", {"RequestId": "2"})
+    event_logger.log("Sending response", {"RequestId": "2"})
+
+    assert [(message["message"], message["summary"]["RequestId"]) for message in log.messages] == [
+        ("Received event", "1"), ("Sending response", "1")]
+
+
+def test_forced_summaries_ignore_the_sample():
+    event_logger, log = summary_logger(sample_rate=0, rand=lambda: 0.5)
+
+    event_logger.sample()
+    event_logger.log("Sending response", {"Status": "SUCCESS"})
+    event_logger.log("Sending response", {"Status": "FAILED"}, force=True)
+
+    assert [message["summary"] for message in log.messages] == [{"Status": "FAILED"}]
+
+
+def test_nothing_is_summarised_unless_debug_is_enabled():
+    log = FakeLogger(enabled=False)
+    event_logger = log_helper.EventSummaryLogger(log=log)
+    event_logger.summarise = None
+
+    event_logger.log("Received event", {}, force=True)
+
+    assert log.messages == []
+
+
+class FakeContext(object):
+    function_name = "function"
+    aws_request_id = "request"
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+def run(monkeypatch, caplog, helper, properties):
+    responses = []
+    monkeypatch.setattr(helper, "_send", functools.partial(
+        resource_helper.CfnResource._send, helper, send_response=lambda url, body: responses.append(body)))
+    event = {
+        "RequestType": "Create",
+        "StackId": "arn:aws:cloudformation:us-east-1:123456789012:stack/my-stack/1a2b3c",
+        "RequestId": "request",
+        "LogicalResourceId": "CognitoAppClient",
+        "ResponseURL": SIGNED_URL,
+        "ResourceType": "Custom::Test",
+        "ResourceProperties": properties,
+    }
+    with caplog.at_level(logging.DEBUG, logger=resource_helper.logger.name):
+        helper(event, FakeContext())
+    return responses[-1]
+
+
+def test_events_and_responses_are_logged_without_secrets(monkeypatch, caplog):
+    helper = resource_helper.CfnResource()
+
+    @helper.create
+    def create(event, context):
+        helper.Data["ClientSecret"] = "client-s3cr3t"
+        return "client1"
+
+    response = run(monkeypatch, caplog, helper, {"Credentials": {"SessionToken": "session-t0ken"}})
+
+    assert response["Data"]["ClientSecret"] == "client-s3cr3t"
+    summaries = [json.loads(record.getMessage()) for record in caplog.records
+                 if record.getMessage().startswith("{")]
+    assert [summary["message"] for summary in summaries] == ["Received event", "Sending response"]
+    for secret in ("X-Amz-Signature", "abc123", "client-s3cr3t", "session-t0ken"):
+        assert secret not in caplog.text
+
+
+def test_failed_responses_are_logged_when_not_sampled(monkeypatch, caplog):
+    helper = resource_helper.CfnResource(log_sample_rate=0)
+
+    @helper.create
+    def create(event, context):
+        raise ValueError("boom")
+
+    response = run(monkeypatch, caplog, helper, {})
+
+    assert response["Status"] == "FAILED"
+    summaries = [json.loads(record.getMessage()) for record in caplog.records
+                 if record.getMessage().startswith("{")]
+    assert [(summary["message"], summary["summary"]["Status"]) for summary in summaries] == [
+        ("Sending response", "FAILED")]
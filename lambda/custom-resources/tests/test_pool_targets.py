@@ -0,0 +1,126 @@
+import pytest
+
+import pool_targets
+
+TARGETS = [
+    {"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa", "RoleArn": None},
+    {"CognitoRegion": "us-west-2", "UserPoolId": "us-west-2_bbb", "RoleArn": None},
+    {"CognitoRegion": "eu-west-1", "UserPoolId": "eu-west-1_ccc", "RoleArn": None},
+]
+
+
+@pytest.fixture(autouse=True)
+def client(monkeypatch):
+    client = object()
+    monkeypatch.setattr(pool_targets, "get_client", lambda region, role_arn=None: client)
+    return client
+
+
+def _fail_in(user_pool_id):
+    def action(client, target):
+        if target["UserPoolId"] == user_pool_id:
+            raise Exception("boom")
+        return {"Id": target["UserPoolId"]}
+    return action
+
+
+def test_get_targets_uses_the_scalar_properties_without_targets():
+    targets = pool_targets.get_targets({"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa"})
+    assert targets == [{"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa", "RoleArn": None}]
+
+
+def test_get_targets_role_arn_of_a_target_overrides_the_resource():
+    targets = pool_targets.get_targets({
+        "RoleArn": "resource-role",
+        "Targets": [
+            {"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa"},
+            {"CognitoRegion": "us-west-2", "UserPoolId": "us-west-2_bbb", "RoleArn": "target-role"},
+        ]
+    })
+    assert [target["RoleArn"] for target in targets] == ["resource-role", "target-role"]
+
+
+def test_apply_returns_results_in_target_order():
+    results = pool_targets.apply(TARGETS, lambda client, target: {"Id": target["UserPoolId"]})
+
+    assert [result["Id"] for result in results] == [target["UserPoolId"] for target in TARGETS]
+    assert all(result["Status"] == pool_targets.SUCCESS for result in results)
+    assert not pool_targets.has_failures(results)
+
+
+def test_apply_rolls_back_the_targets_that_succeeded(client):
+    rolled_back = []
+
+    def rollback(rollback_client, result):
+        assert rollback_client is client
+        rolled_back.append(result["Id"])
+
+    results = pool_targets.apply(TARGETS, _fail_in("us-west-2_bbb"), rollback=rollback)
+
+    assert sorted(rolled_back) == ["eu-west-1_ccc", "us-east-1_aaa"]
+    assert [result["Status"] for result in results] == [
+        pool_targets.ROLLED_BACK, pool_targets.FAILED, pool_targets.ROLLED_BACK]
+    assert results[1]["Reason"] == "boom"
+
+
+def test_apply_without_failures_does_not_roll_back():
+    rolled_back = []
+    pool_targets.apply(TARGETS, lambda client, target: None,
+                       rollback=lambda client, result: rolled_back.append(result))
+    assert rolled_back == []
+
+
+def test_apply_reports_failed_rollbacks():
+    def rollback(client, result):
+        if result["UserPoolId"] == "eu-west-1_ccc":
+            raise Exception("still there")
+
+    results = pool_targets.apply(TARGETS, _fail_in("us-west-2_bbb"), rollback=rollback)
+
+    assert [result["Status"] for result in results] == [
+        pool_targets.ROLLED_BACK, pool_targets.FAILED, pool_targets.ROLLBACK_FAILED]
+    assert results[2]["Reason"] == "still there"
+
+
+def test_raise_for_failures_names_every_failed_target():
+    results = pool_targets.apply(TARGETS, _fail_in("us-west-2_bbb"))
+
+    with pytest.raises(ValueError) as error:
+        pool_targets.raise_for_failures(results, "unable to create")
+    assert str(error.value) == "unable to create: us-west-2/us-west-2_bbb: boom"
+
+
+def test_outcomes_keep_only_the_outcome_of_every_target():
+    results = pool_targets.apply(TARGETS, lambda client, target: {
+        "ClientId": "client", "Created": True, "Attributes": {"ClientSecret": "s3cr3t"}})
+
+    assert pool_targets.outcomes(results)[0] == {"UserPoolId": "us-east-1_aaa", "ClientId": "client",
+                                                 "Status": pool_targets.SUCCESS}
+
+
+def test_outcomes_cut_long_reasons():
+    def action(client, target):
+        raise Exception("x" * 1000)
+
+    outcome = pool_targets.outcomes(pool_targets.apply(TARGETS[:1], action))[0]
+
+    assert outcome["Reason"] == "x" * pool_targets.MAX_REASON_LENGTH + "..."
+
+
+def _pools(count):
+    return [{"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_{:09d}".format(number), "RoleArn": None}
+            for number in range(count)]
+
+
+def test_outcomes_of_many_targets_fit_a_response():
+    import json
+
+    def failure(client, target):
+        raise Exception("An error occurred (TooManyRequestsException) when calling the "
+                        "CreateResourceServer operation: Rate exceeded, please retry the request later")
+
+    def success(client, target):
+        return {"ClientId": "1example23456789abcdefghij", "Created": True}
+
+    assert len(json.dumps(pool_targets.outcomes(pool_targets.apply(_pools(25), failure)))) < 4096
+    assert len(json.dumps(pool_targets.outcomes(pool_targets.apply(_pools(40), success)))) < 4096
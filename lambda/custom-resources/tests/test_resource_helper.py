@@ -0,0 +1,158 @@
+import asyncio
+import functools
+import threading
+import time
+
+import pytest
+
+from crhelper import resource_helper
+import pool_targets
+import resource_server
+
+STACK_ID = "arn:aws:cloudformation:us-east-1:123456789012:stack/my-stack/1a2b3c"
+
+
+class FakeContext(object):
+    function_name = "function"
+    aws_request_id = "request"
+
+    def __init__(self, remaining_ms=30000):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def event(request_type, properties, **kwargs):
+    return dict({
+        "RequestType": request_type,
+        "StackId": STACK_ID,
+        "RequestId": "request",
+        "LogicalResourceId": "L",
+        "ResponseURL": "https://cloudformation-custom-resource-response/?Signature=secret",
+        "ResourceType": "Custom::Test",
+        "ResourceProperties": properties,
+    }, **kwargs)
+
+
+def capture(monkeypatch, helper):
+    responses = []
+    monkeypatch.setattr(helper, "_send", functools.partial(
+        resource_helper.CfnResource._send, helper, send_response=lambda url, body: responses.append(body)))
+    monkeypatch.setattr(helper, "_wait_for_cwlogs", lambda: None)
+    return responses
+
+
+@pytest.fixture
+def server(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pool_targets, "apply", lambda targets, action, rollback=None: calls.append(targets) or [
+        dict(target, Status=pool_targets.SUCCESS) for target in targets])
+    return calls, capture(monkeypatch, resource_server.helper)
+
+
+INVALID = {
+    "CognitoRegion": "us-east-1",
+    "UserPoolId": "us-east-1_aaa",
+    "RoleArn": "arn:aws:iam::123456789012:role/admin",
+    "Identifier": "api",
+    "Name": "api",
+    "Scopes": [],
+}
+
+
+def test_rollback_of_a_create_that_failed_validation_succeeds(server):
+    calls, responses = server
+
+    resource_server.handler(event("Create", dict(INVALID)), FakeContext())
+    create = responses[-1]
+    assert create["Status"] == "FAILED"
+    assert create["PhysicalResourceId"].startswith("my-stack_L_")
+
+    resource_server.handler(event("Delete", dict(INVALID), PhysicalResourceId=create["PhysicalResourceId"]),
+                            FakeContext())
+    assert responses[-1]["Status"] == "SUCCESS"
+    assert responses[-1]["PhysicalResourceId"] == create["PhysicalResourceId"]
+    assert calls == []
+
+
+def test_delete_of_a_created_resource_with_invalid_properties_fails(server):
+    calls, responses = server
+
+    resource_server.handler(event("Delete", dict(INVALID), PhysicalResourceId="api"), FakeContext())
+
+    assert responses[-1]["Status"] == "FAILED"
+    assert "RoleArn is not an allowed role" in responses[-1]["Reason"]
+    assert calls == []
+
+
+def test_delete_only_validates_the_locating_properties(server):
+    calls, responses = server
+    properties = dict(INVALID, Scopes="not a list")
+    del properties["RoleArn"]
+
+    resource_server.handler(event("Delete", properties, PhysicalResourceId="api"), FakeContext())
+
+    assert responses[-1]["Status"] == "SUCCESS"
+    assert calls == [[{"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa", "RoleArn": None}]]
+
+
+def test_executor_calls_of_an_async_handler_overlap(monkeypatch):
+    helper = resource_helper.CfnResource(max_workers=4)
+    responses = capture(monkeypatch, helper)
+    # every call waits for the other three, so the calls only complete when they run at the same time
+    barrier = threading.Barrier(4, timeout=5)
+
+    @helper.create
+    async def create(event, context):
+        await asyncio.gather(*[helper.run_in_executor(barrier.wait) for _ in range(4)])
+        return "overlapped"
+
+    helper(event("Create", {}), FakeContext())
+
+    assert responses[-1]["Status"] == "SUCCESS"
+    assert responses[-1]["PhysicalResourceId"] == "overlapped"
+
+
+def test_the_event_loop_is_reused_by_warm_invocations(monkeypatch):
+    helper = resource_helper.CfnResource()
+    capture(monkeypatch, helper)
+    loops = []
+
+    @helper.create
+    async def create(event, context):
+        loops.append(asyncio.get_running_loop())
+        await helper.run_in_executor(lambda: None)
+        return "resource"
+
+    helper(event("Create", {}), FakeContext())
+    helper(event("Create", {}), FakeContext())
+
+    assert len(loops) == 2
+    assert loops[0] is loops[1]
+    assert not loops[0].is_closed()
+
+
+def test_async_handlers_are_cancelled_a_second_before_the_deadline(monkeypatch):
+    helper = resource_helper.CfnResource()
+    responses = capture(monkeypatch, helper)
+    cancelled = []
+
+    @helper.create
+    async def create(event, context):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(time.time())
+            raise
+        return "resource"
+
+    started = time.time()
+    helper(event("Create", {}), FakeContext(remaining_ms=1300))
+
+    # the timeout timer is cancelled, so only the failure of the handler is sent
+    assert [(response["Status"], response["Reason"]) for response in responses] == [
+        ("FAILED", "Execution timed out")]
+    assert len(cancelled) == 1
+    # 1.3 seconds were left, so the handler is cancelled after about 0.3 seconds
+    assert 0.2 < cancelled[0] - started < 0.8
@@ -0,0 +1,132 @@
+import pytest
+
+import schemas
+
+CLIENT = {
+    "CognitoRegion": "us-east-1",
+    "UserPoolId": "us-east-1_aaa",
+    "AppClientName": "internal",
+    "CustomScope": "api/ddb.read",
+}
+
+
+def _error(schema, properties):
+    with pytest.raises(ValueError) as error:
+        schema.validate(properties)
+    return str(error.value)
+
+
+def test_valid_properties_are_returned_with_unknown_fields():
+    properties = dict(CLIENT, ServiceToken="arn:aws:lambda:us-east-1:123456789012:function:f")
+    assert schemas.USER_POOL_CLIENT.validate(properties) == properties
+
+
+def test_missing_required_field():
+    properties = dict(CLIENT)
+    del properties["AppClientName"]
+    assert _error(schemas.USER_POOL_CLIENT, properties) == "ResourceProperties.AppClientName is required"
+
+
+def test_empty_required_field():
+    assert _error(schemas.USER_POOL_CLIENT, dict(CLIENT, CustomScope="")) == \
+        "ResourceProperties.CustomScope is required"
+
+
+def test_targets_or_scalar_user_pool_is_required():
+    properties = dict(CLIENT)
+    del properties["UserPoolId"]
+    assert _error(schemas.USER_POOL_CLIENT, properties) == \
+        "ResourceProperties requires one of: Targets or CognitoRegion+UserPoolId"
+
+
+def test_pattern_mismatch_names_the_field():
+    assert "ResourceProperties.CognitoRegion is invalid: 'us east 1'" in \
+        _error(schemas.USER_POOL_CLIENT, dict(CLIENT, CognitoRegion="us east 1"))
+
+
+@pytest.mark.parametrize("region", ["us-east-1", "us-gov-west-1", "us-iso-east-1", "us-isob-east-1", "cn-north-1"])
+def test_regions_of_every_partition_are_accepted(region):
+    assert schemas.USER_POOL_CLIENT.validate(dict(CLIENT, CognitoRegion=region))["CognitoRegion"] == region
+
+
+def test_nested_errors_carry_the_path():
+    properties = {
+        "CognitoRegion": "us-east-1",
+        "UserPoolId": "us-east-1_aaa",
+        "Identifier": "api",
+        "Name": "api",
+        "Scopes": [{"ScopeName": "read", "ScopeDescription": "Read"}, {"ScopeName": "write"}],
+    }
+    assert _error(schemas.RESOURCE_SERVER, properties) == \
+        "ResourceProperties.Scopes[1].ScopeDescription is required"
+
+
+def test_wrong_types():
+    assert _error(schemas.USER_POOL_CLIENT, dict(CLIENT, Targets={})) == "ResourceProperties.Targets must be a list"
+    assert _error(schemas.USER_POOL_CLIENT, dict(CLIENT, Targets=[])) == \
+        "ResourceProperties.Targets must have at least 1 item(s)"
+    assert _error(schemas.USER_POOL_CLIENT, dict(CLIENT, AppClientName=["a"])) == \
+        "ResourceProperties.AppClientName must be a string"
+
+
+def test_integers_are_coerced_and_bounded():
+    properties = {
+        "CognitoRegion": "us-east-1",
+        "UserPoolId": "us-east-1_aaa",
+        "CloudWatchLogsRoleArn": "arn:aws:iam::123456789012:role/logs",
+        "UserSource": "s3://bucket/users.jsonl",
+    }
+    assert schemas.USER_IMPORT.validate(dict(properties, ChunkSize="1000"))["ChunkSize"] == 1000
+    assert _error(schemas.USER_IMPORT, dict(properties, ChunkSize="many")) == \
+        "ResourceProperties.ChunkSize must be an integer"
+    assert _error(schemas.USER_IMPORT, dict(properties, ChunkSize=500001)) == \
+        "ResourceProperties.ChunkSize must be at most 500000"
+    assert _error(schemas.USER_IMPORT, dict(properties, ChunkSize=True)) == \
+        "ResourceProperties.ChunkSize must be an integer"
+
+
+def test_unknown_export_attribute():
+    assert _error(schemas.USER_POOL_CLIENT, dict(CLIENT, ExportAttributes=["ClientName", "ClientSecrett"])) == \
+        "ResourceProperties.ExportAttributes[1] is not a UserPoolClient attribute: 'ClientSecrett'"
+
+
+def test_role_arn_must_be_allowed():
+    allowed = "arn:aws:iam::123456789012:role/cognito-custom-resources-prod"
+    assert schemas.USER_POOL_CLIENT.validate(dict(CLIENT, RoleArn=allowed))["RoleArn"] == allowed
+
+    assert "ResourceProperties.Targets[0].RoleArn is not an allowed role" in _error(
+        schemas.USER_POOL_CLIENT,
+        dict(CLIENT, Targets=[{"CognitoRegion": "us-east-1", "UserPoolId": "us-east-1_aaa",
+                               "RoleArn": "arn:aws:iam::123456789012:role/admin"}]))
+
+
+def test_no_role_is_allowed_without_patterns():
+    validate = schemas._matching(schemas._ROLE_ARN, [], "role")
+    with pytest.raises(ValueError):
+        validate("arn:aws:iam::123456789012:role/cognito-custom-resources-prod", "RoleArn")
+
+
+def test_delete_only_checks_the_locating_fields():
+    properties = dict(CLIENT, AppClientName="", CustomScope="not a scope", ExportSink="file:///tmp/clients.json")
+    assert schemas.USER_POOL_CLIENT.validate_delete(properties) == properties
+
+    with pytest.raises(ValueError) as error:
+        schemas.USER_POOL_CLIENT.validate_delete(dict(properties, UserPoolId="not a pool"))
+    assert "ResourceProperties.UserPoolId is invalid" in str(error.value)
+
+
+@pytest.mark.parametrize("sink", ["ssm:///cognito-custom-resources", "ssm:///cognito-custom-resources/prod/",
+                                  "file:///tmp/clients.json"])
+def test_export_sinks_below_the_parameter_prefix_are_accepted(sink):
+    assert schemas.USER_POOL_CLIENT.validate(dict(CLIENT, ExportSink=sink))["ExportSink"] == sink
+
+
+@pytest.mark.parametrize("sink", ["ssm:///", "ssm:///other", "ssm:///cognito-custom-resources-other/prod"])
+def test_ssm_export_sinks_outside_the_parameter_prefix_are_rejected(sink):
+    assert "ResourceProperties.ExportSink must be below the parameter path /cognito-custom-resources" in \
+        _error(schemas.USER_POOL_CLIENT, dict(CLIENT, ExportSink=sink))
+
+
+def test_no_ssm_export_sink_is_allowed_without_a_prefix():
+    with pytest.raises(ValueError):
+        schemas._export_sink("")("ssm:///cognito-custom-resources", "ExportSink")
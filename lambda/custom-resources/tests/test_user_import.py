@@ -0,0 +1,252 @@
+import csv
+import functools
+import io
+import json
+import tempfile
+
+import pytest
+
+from crhelper import resource_helper
+import pool_targets
+import user_import
+
+HEADER = ["cognito:username", "email", "email_verified"]
+
+
+def _source(users, line_ending=b"\n", trailing=True):
+    lines = [json.dumps(user).encode("utf-8") for user in users]
+    data = line_ending.join(lines)
+    if trailing:
+        data += line_ending
+    return data
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    # a small read size makes lines span several reads
+    iter_lines = user_import._iter_lines
+    monkeypatch.setattr(user_import, "_iter_lines", lambda stream: iter_lines(stream, read_size=7))
+
+
+def _write_chunk(data, offset, chunk_size):
+    source = io.BytesIO(data)
+    source.seek(offset)
+    with tempfile.TemporaryFile() as csv_file:
+        result = user_import._write_chunk(source, offset, HEADER, chunk_size, csv_file)
+        csv_file.seek(0)
+        rows = list(csv.reader(io.TextIOWrapper(csv_file, encoding="utf-8", newline="")))
+    return result, rows
+
+
+def _users(count):
+    return [{"cognito:username": "user{}".format(number), "email": "user{}@example.com".format(number),
+             "email_verified": number % 2 == 0} for number in range(count)]
+
+
+def test_chunk_stops_at_the_first_user_that_was_not_written():
+    data = _source(_users(5))
+
+    (offset, users, exhausted), rows = _write_chunk(data, 0, 2)
+
+    assert (users, exhausted) == (2, False)
+    assert offset == data.index(b"\n", data.index(b"\n") + 1) + 1
+    assert rows[0] == HEADER
+    assert rows[1:] == [["user0", "user0@example.com", "true"], ["user1", "user1@example.com", "false"]]
+
+
+def test_chunks_resume_at_the_offset_until_the_source_is_exhausted():
+    data = _source(_users(5))
+
+    offset, usernames, chunks = 0, [], []
+    while True:
+        (offset, users, exhausted), rows = _write_chunk(data, offset, 2)
+        usernames.extend(row[0] for row in rows[1:])
+        chunks.append(users)
+        if exhausted:
+            break
+
+    assert chunks == [2, 2, 1]
+    assert offset == len(data)
+    assert usernames == ["user{}".format(number) for number in range(5)]
+
+
+def test_a_chunk_that_exactly_fits_the_rest_of_the_source_is_exhausted():
+    data = _source(_users(4))
+
+    (offset, users, exhausted), _ = _write_chunk(data, 0, 4)
+
+    assert (offset, users, exhausted) == (len(data), 4, True)
+
+
+def test_blank_lines_are_skipped_but_counted_in_the_offset():
+    data = b"\n" + _source(_users(2), line_ending=b"\r\n\r\n")
+
+    (offset, users, exhausted), rows = _write_chunk(data, 0, 10)
+
+    assert (offset, users, exhausted) == (len(data), 2, True)
+    assert [row[0] for row in rows[1:]] == ["user0", "user1"]
+
+
+def test_last_line_without_line_ending():
+    data = _source(_users(3), trailing=False)
+
+    (offset, users, _), _ = _write_chunk(data, 0, 2)
+    (offset, users, exhausted), rows = _write_chunk(data, offset, 2)
+
+    assert (offset, users, exhausted) == (len(data), 1, True)
+    assert rows[1][0] == "user2"
+
+
+def test_offsets_count_bytes_of_multibyte_characters():
+    users = [{"cognito:username": "jürgen", "email": "j@example.com"}, {"cognito:username": "zoë"}]
+    data = _source(users)
+
+    (offset, users, exhausted), rows = _write_chunk(data, 0, 1)
+    assert (offset, users, exhausted) == (data.index(b"\n") + 1, 1, False)
+    assert rows[1] == ["jürgen", "j@example.com", ""]
+
+    (offset, users, exhausted), rows = _write_chunk(data, offset, 1)
+    assert (offset, users, exhausted) == (len(data), 1, True)
+    assert rows[1][0] == "zoë"
+
+
+class FakeCognito(object):
+    """
+    cognito-idp stand-in for the import jobs of a user pool,
+    list_user_import_jobs returns two jobs per page.
+    """
+
+    def __init__(self, jobs=()):
+        self.jobs = list(jobs)
+        self.calls = []
+
+    def get_csv_header(self, UserPoolId):
+        return {"CSVHeader": HEADER}
+
+    def create_user_import_job(self, JobName, UserPoolId, CloudWatchLogsRoleArn):
+        self.calls.append(("create", JobName))
+        job = {"JobName": JobName, "JobId": "import-{}".format(len(self.jobs) + 1), "UserPoolId": UserPoolId,
+               "Status": "Created", "PreSignedUrl": "https://upload.example.com/"}
+        self.jobs.append(job)
+        return {"UserImportJob": dict(job)}
+
+    def start_user_import_job(self, UserPoolId, JobId):
+        self.calls.append(("start", JobId))
+
+    def list_user_import_jobs(self, UserPoolId, MaxResults, PaginationToken=None):
+        start = int(PaginationToken or 0)
+        response = {"UserImportJobs": [dict(job) for job in self.jobs[start:start + 2]]}
+        if start + 2 < len(self.jobs):
+            response["PaginationToken"] = str(start + 2)
+        return response
+
+
+class FakeResponse(object):
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def cognito(monkeypatch):
+    cognito = FakeCognito()
+    uploads = []
+    monkeypatch.setattr(pool_targets, "get_client", lambda region, role_arn=None, service_name=None: cognito)
+    monkeypatch.setattr(user_import.requests, "put",
+                        lambda url, data, headers: uploads.append(data.read()) or FakeResponse())
+    monkeypatch.setattr(user_import.helper, "Data", {})
+    return cognito, uploads
+
+
+def event(request_type, user_source, **kwargs):
+    return dict({
+        "RequestType": request_type,
+        "StackId": "arn:aws:cloudformation:us-east-1:123456789012:stack/my-stack/1a2b3c",
+        "RequestId": "0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0",
+        "LogicalResourceId": "UserImport",
+        "ResponseURL": "https://cloudformation-custom-resource-response/",
+        "ResourceType": "Custom::UserImport",
+        "ResourceProperties": {
+            "CognitoRegion": "us-east-1",
+            "UserPoolId": "us-east-1_aaa",
+            "CloudWatchLogsRoleArn": "arn:aws:iam::123456789012:role/import-logs",
+            "UserSource": user_source,
+            "ChunkSize": 2,
+        },
+    }, **kwargs)
+
+
+def test_overlapping_polls_start_a_chunk_only_once(cognito, tmp_path):
+    cognito, uploads = cognito
+    source = tmp_path / "users.jsonl"
+    source.write_bytes(_source(_users(5)))
+    # a dozen finished jobs of other resources push the job onto a later page
+    cognito.jobs = [{"JobName": "Other-{}".format(number), "JobId": "other-{}".format(number),
+                     "UserPoolId": "us-east-1_aaa", "Status": "Succeeded"} for number in range(12)]
+
+    states = []
+    for _ in range(2):
+        # both polls start from the state handed to them by the previous poll
+        user_import._init_state()
+        user_import._start_next_job(event("Create", str(source)))
+        states.append(dict(user_import.helper.Data))
+
+    job_name = "{}-0f1e2d3c-1".format(user_import._job_name_prefix(event("Create", str(source))))
+    assert cognito.calls == [("create", job_name), ("start", "import-13")]
+    assert len(uploads) == 1
+    assert states[0] == states[1]
+    assert states[0]["JobId"] == "import-13"
+    assert states[0]["SourceOffset"] == len(_source(_users(2)))
+
+
+def test_a_new_request_does_not_reuse_the_jobs_of_an_earlier_one(cognito, tmp_path):
+    cognito, uploads = cognito
+    source = tmp_path / "users.jsonl"
+    source.write_bytes(_source(_users(1)))
+
+    for request_id in ("11111111-2222-3333-4444-555555555555", "66666666-7777-8888-9999-000000000000"):
+        user_import._init_state()
+        user_import._start_next_job(event("Create", str(source), RequestId=request_id))
+
+    assert [call for call in cognito.calls if call[0] == "start"] == [("start", "import-1"), ("start", "import-2")]
+
+
+class FakeContext(object):
+    function_name = "function"
+    aws_request_id = "request"
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+def run(monkeypatch, handler_event):
+    responses = []
+    helper = user_import.helper
+    monkeypatch.setattr(helper, "_send", functools.partial(
+        resource_helper.CfnResource._send, helper, send_response=lambda url, body: responses.append(body)))
+    user_import.handler(handler_event, FakeContext())
+    return responses
+
+
+def test_an_unchanged_update_responds_without_polling(cognito, monkeypatch, tmp_path):
+    cognito, uploads = cognito
+    source = str(tmp_path / "users.jsonl")
+    update = event("Update", source, PhysicalResourceId="us-east-1_aaa/" + source)
+    update["OldResourceProperties"] = dict(update["ResourceProperties"], ChunkSize=10)
+
+    responses = run(monkeypatch, update)
+
+    assert [(response["Status"], response["PhysicalResourceId"]) for response in responses] == [
+        ("SUCCESS", "us-east-1_aaa/" + source)]
+    assert cognito.calls == []
+
+
+def test_an_empty_source_responds_without_polling(cognito, monkeypatch, tmp_path):
+    cognito, uploads = cognito
+    source = tmp_path / "users.jsonl"
+    source.write_bytes(b"\n")
+
+    responses = run(monkeypatch, event("Create", str(source)))
+
+    assert [(response["Status"], response["Data"]["ImportedUsers"]) for response in responses] == [("SUCCESS", 0)]
+    assert cognito.calls == []
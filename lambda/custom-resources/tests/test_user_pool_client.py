@@ -0,0 +1,123 @@
+import pytest
+
+import pool_targets
+import user_pool_client
+
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class InvalidParameterException(Exception):
+    pass
+
+
+class FakeCognito(object):
+    """
+    cognito-idp stand-in holding the app clients of every user pool.
+    """
+
+    class exceptions(object):
+        ResourceNotFoundException = ResourceNotFoundException
+        InvalidParameterException = InvalidParameterException
+
+    def __init__(self):
+        self.clients = {}
+        self.errors = {}
+        self.created = 0
+
+    def _check(self, operation, client_id):
+        if not user_pool_client.CLIENT_ID.fullmatch(client_id):
+            raise InvalidParameterException(client_id)
+        if (operation, client_id) in self.errors:
+            raise self.errors[(operation, client_id)]
+        if client_id not in self.clients:
+            raise ResourceNotFoundException(client_id)
+
+    def create_user_pool_client(self, UserPoolId, GenerateSecret, **settings):
+        self.created += 1
+        client_id = "client{}".format(self.created)
+        self.clients[client_id] = dict(settings, UserPoolId=UserPoolId, ClientId=client_id, ClientSecret="s3cr3t")
+        return {"UserPoolClient": dict(self.clients[client_id])}
+
+    def describe_user_pool_client(self, UserPoolId, ClientId):
+        self._check("describe", ClientId)
+        return {"UserPoolClient": dict(self.clients[ClientId])}
+
+    def update_user_pool_client(self, UserPoolId, ClientId, **settings):
+        self._check("update", ClientId)
+        self.clients[ClientId].update(settings)
+        return {"UserPoolClient": dict(self.clients[ClientId])}
+
+    def delete_user_pool_client(self, UserPoolId, ClientId):
+        self._check("delete", ClientId)
+        del self.clients[ClientId]
+
+
+@pytest.fixture
+def cognito(monkeypatch):
+    cognito = FakeCognito()
+    monkeypatch.setattr(pool_targets, "get_client", lambda region, role_arn=None, service_name=None: cognito)
+    user_pool_client.helper.Data = {}
+    user_pool_client.helper.NoEcho = False
+    return cognito
+
+
+PROPERTIES = {
+    "CognitoRegion": "us-east-1",
+    "UserPoolId": "us-east-1_aaa",
+    "AppClientName": "internal",
+    "CustomScope": "api/ddb.read",
+}
+
+
+def event(request_type, physical_resource_id=None, properties=PROPERTIES):
+    event = {"RequestType": request_type, "ResourceProperties": dict(properties),
+             "OldResourceProperties": dict(properties)}
+    if physical_resource_id:
+        event["PhysicalResourceId"] = physical_resource_id
+    return event
+
+
+def test_delete_skips_physical_ids_generated_for_failed_creates(cognito):
+    user_pool_client.delete(event("Delete", "proj1-cognito-test-infra-cognito_CognitoAppClient_AB12CD34"), None)
+
+    assert user_pool_client.helper.Data["Targets"] == []
+
+
+def test_delete_deletes_the_client(cognito):
+    client_id = user_pool_client.create(event("Create"), None)
+
+    user_pool_client.delete(event("Delete", client_id), None)
+
+    assert cognito.clients == {}
+
+
+def test_update_replaces_the_client_when_it_is_gone(cognito):
+    client_id = user_pool_client.create(event("Create"), None)
+    del cognito.clients[client_id]
+
+    new_client_id = user_pool_client.update(event("Update", client_id), None)
+
+    assert new_client_id != client_id
+    assert list(cognito.clients) == [new_client_id]
+
+
+def test_update_fails_without_replacing_on_other_describe_errors(cognito):
+    client_id = user_pool_client.create(event("Create"), None)
+    cognito.errors[("describe", client_id)] = Exception("Rate exceeded")
+
+    with pytest.raises(ValueError) as error:
+        user_pool_client.update(event("Update", client_id), None)
+
+    assert "unable to describe app client: us-east-1/us-east-1_aaa: Rate exceeded" == str(error.value)
+    assert list(cognito.clients) == [client_id]
+
+
+def test_update_keeps_the_client(cognito):
+    client_id = user_pool_client.create(event("Create"), None)
+    properties = dict(PROPERTIES, AppClientName="renamed")
+
+    assert user_pool_client.update(event("Update", client_id, properties), None) == client_id
+    assert cognito.clients[client_id]["ClientName"] == "renamed"
+    assert user_pool_client.helper.Data["ClientName"] == "renamed"
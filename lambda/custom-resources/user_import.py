@@ -0,0 +1,294 @@
+__version__ = '0.1.0'
+__version_info__ = tuple([int(num) for num in __version__.split('.')])
+
+from crhelper import CfnResource
+import csv
+import hashlib
+import io
+import json
+import logging
+import pool_targets
+import requests
+import schemas
+import tempfile
+
+logger = logging.getLogger(__name__)
+# Initialise the helper, all inputs are optional, this example shows the defaults
+helper = CfnResource(json_logging=False, log_level='DEBUG', boto_level='CRITICAL')
+helper.validate(schemas.USER_IMPORT.validate)
+helper.validate_delete(schemas.USER_IMPORT.validate_delete)
+
+# Users per import job, unless ChunkSize is set
+DEFAULT_CHUNK_SIZE = 100000
+
+PENDING_STATUSES = ["Created", "Pending", "InProgress", "Stopping"]
+FAILED_STATUSES = ["Failed", "Stopped", "Expired"]
+
+@helper.create
+def create(event, context):
+    """
+    Imports the users of UserSource into the user pool.
+
+    UserSource is an `s3://bucket/key` object, or a local file, with one JSON
+    object of user attributes per line, keyed by the columns of the user
+    pool's CSV header (e.g. `cognito:username`, `email`). The users are
+    imported in chunks of ChunkSize users, one import job at a time: each
+    chunk is streamed from the source into a CSV file on disk and uploaded
+    to the pre-signed url of its import job, so memory use does not depend on
+    the number of users. The next chunk is started by poll_create once the
+    previous job has finished.
+    """
+    logger.debug("Starting user import..")
+
+    resource_properties = event["ResourceProperties"]
+
+    _init_state()
+    _start_next_job(event)
+    if not helper.Data["JobId"]:
+        logger.debug("User source is empty, nothing to import..")
+        helper.SkipPolling = True
+
+    physical_resource_id = "{}/{}".format(resource_properties["UserPoolId"], resource_properties["UserSource"])
+    return physical_resource_id
+
+@helper.update
+def update(event, context):
+    """
+    Users that were imported are kept, so an update only starts a new import
+    when the user pool or the source of the users changed.
+    """
+    logger.debug("Updating user import..")
+
+    resource_properties = event["ResourceProperties"]
+    old_resource_properties = event.get("OldResourceProperties", {})
+
+    if all(resource_properties.get(name) == old_resource_properties.get(name)
+           for name in ("UserPoolId", "UserSource")):
+        logger.debug("User pool and user source unchanged, nothing to import..")
+        _init_state()
+        helper.Data["SourceExhausted"] = True
+        helper.SkipPolling = True
+        return event['PhysicalResourceId']
+
+    return create(event, context)
+
+@helper.delete
+def delete(event, context):
+    """
+    Stops the import jobs of this resource that are still running. Imported
+    users are not deleted.
+    """
+    logger.debug("Deleting user import..")
+
+    resource_properties = event["ResourceProperties"]
+    client = _get_client(resource_properties)
+    prefix = _job_name_prefix(event)
+
+    for job in _list_jobs(client, resource_properties["UserPoolId"]):
+        if job["JobName"].startswith(prefix) and job["Status"] in ("Created", "Pending", "InProgress"):
+            logger.debug("Stopping user import job {}".format(job["JobId"]))
+            client.stop_user_import_job(UserPoolId=job["UserPoolId"], JobId=job["JobId"])
+
+    logger.debug("Finished deleting user import..")
+
+    return
+
+@helper.poll_create
+def poll_create(event, context):
+    """
+    Tracks the running import job and starts the next chunk once it has
+    succeeded. The state is kept in Data, which crhelper hands to the next
+    poll. Returns the physical id once every chunk has been imported.
+    """
+    logger.info("Create polling..")
+
+    resource_properties = event["ResourceProperties"]
+
+    if helper.Data["JobId"]:
+        client = _get_client(resource_properties)
+        job = client.describe_user_import_job(
+            UserPoolId=resource_properties["UserPoolId"],
+            JobId=helper.Data["JobId"]
+        ).get("UserImportJob")
+
+        logger.debug("User import job {} is {}".format(job["JobId"], job["Status"]))
+        if job["Status"] in PENDING_STATUSES:
+            return None
+        if job["Status"] in FAILED_STATUSES:
+            raise ValueError("user import job {} {}: {}".format(
+                job["JobId"], job["Status"].lower(), job.get("CompletionMessage")))
+
+        helper.Data["JobId"] = ""
+        helper.Data["JobsCompleted"] += 1
+        helper.Data["ImportedUsers"] += job.get("ImportedUsers", 0)
+        helper.Data["SkippedUsers"] += job.get("SkippedUsers", 0)
+        helper.Data["FailedUsers"] += job.get("FailedUsers", 0)
+
+    if helper.Data["SourceExhausted"]:
+        logger.debug("Finished user import..")
+        return helper.Data["PhysicalResourceId"]
+
+    _start_next_job(event)
+    return None
+
+helper.poll_update(poll_create)
+
+def _init_state():
+    helper.Data.update({
+        "SourceOffset": 0,
+        "SourceExhausted": False,
+        "JobId": "",
+        "JobsCompleted": 0,
+        "ImportedUsers": 0,
+        "SkippedUsers": 0,
+        "FailedUsers": 0
+    })
+
+def _start_next_job(event):
+    """
+    Streams the next chunk of users into an import job and starts it.
+    """
+    resource_properties = event["ResourceProperties"]
+    user_pool_id = resource_properties["UserPoolId"]
+    chunk_size = resource_properties.get("ChunkSize", DEFAULT_CHUNK_SIZE)
+    client = _get_client(resource_properties)
+
+    header = client.get_csv_header(UserPoolId=user_pool_id).get("CSVHeader")
+
+    with tempfile.TemporaryFile() as csv_file:
+        source = _open_source(resource_properties, helper.Data["SourceOffset"])
+        try:
+            offset, users, exhausted = _write_chunk(source, helper.Data["SourceOffset"], header, chunk_size, csv_file)
+        finally:
+            source.close()
+
+        if users == 0:
+            helper.Data["SourceExhausted"] = True
+            return
+
+        # the name is the same for every invocation working on this chunk of
+        # this request, so a poll that overlaps the one that started the
+        # chunk tracks its job instead of importing the chunk again
+        job_name = "{}-{}-{}".format(_job_name_prefix(event), event["RequestId"][:8], helper.Data["JobsCompleted"] + 1)
+        job = next((job for job in _list_jobs(client, user_pool_id) if job["JobName"] == job_name), None)
+        if job is not None:
+            logger.debug("User import job {} was already created, tracking it..".format(job["JobId"]))
+        else:
+            job = client.create_user_import_job(
+                JobName=job_name,
+                UserPoolId=user_pool_id,
+                CloudWatchLogsRoleArn=resource_properties["CloudWatchLogsRoleArn"]
+            ).get("UserImportJob")
+
+            logger.debug("Uploading {} users for user import job {}..".format(users, job["JobId"]))
+            csv_file.seek(0)
+            response = requests.put(
+                job["PreSignedUrl"],
+                data=csv_file,
+                headers={"x-amz-server-side-encryption": "aws:kms"}
+            )
+            response.raise_for_status()
+
+            client.start_user_import_job(UserPoolId=user_pool_id, JobId=job["JobId"])
+
+    helper.Data.update({
+        "SourceOffset": offset,
+        "SourceExhausted": exhausted,
+        "JobId": job["JobId"]
+    })
+
+def _write_chunk(source, offset, header, chunk_size, csv_file):
+    """
+    Writes up to chunk_size users from the source to csv_file.
+    Returns the offset of the first user that was not written, the number of
+    users written and whether the end of the source was reached.
+    """
+    text_file = io.TextIOWrapper(csv_file, encoding="utf-8", newline="")
+    try:
+        writer = csv.writer(text_file)
+        writer.writerow(header)
+
+        users = 0
+        for line in _iter_lines(source):
+            if users == chunk_size:
+                # there is at least one more user, it is read again by the next chunk
+                return offset, users, False
+            offset += len(line)
+            if not line.strip():
+                continue
+            user = json.loads(line.decode("utf-8"))
+            writer.writerow([_csv_value(user.get(column)) for column in header])
+            users += 1
+
+        return offset, users, True
+    finally:
+        # detach, so closing the wrapper does not close csv_file
+        text_file.flush()
+        text_file.detach()
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return ""
+    return value
+
+def _iter_lines(stream, read_size=65536):
+    """
+    Yields the lines of a binary stream including their line endings, so the
+    byte offset into the source can be tracked.
+    """
+    pending = b""
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            break
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+def _open_source(resource_properties, offset):
+    """
+    Returns a binary stream of the user source starting at offset.
+    """
+    user_source = resource_properties["UserSource"]
+    if user_source.startswith("s3://"):
+        bucket, key = user_source[len("s3://"):].split("/", 1)
+        # the source is read with the same credentials as the user pool
+        client = pool_targets.get_client(resource_properties["CognitoRegion"], resource_properties.get("RoleArn"),
+                                         service_name="s3")
+        return client.get_object(Bucket=bucket, Key=key, Range="bytes={}-".format(offset)).get("Body")
+
+    if user_source.startswith("file://"):
+        user_source = user_source[len("file://"):]
+    source = open(user_source, "rb")
+    source.seek(offset)
+    return source
+
+def _list_jobs(client, user_pool_id):
+    kwargs = {"UserPoolId": user_pool_id, "MaxResults": 60}
+    while True:
+        response = client.list_user_import_jobs(**kwargs)
+        for job in response.get("UserImportJobs", []):
+            yield job
+        if not response.get("PaginationToken"):
+            return
+        kwargs["PaginationToken"] = response["PaginationToken"]
+
+def _job_name_prefix(event):
+    # the source is part of the name, so replacing the resource with another
+    # source does not stop the new jobs when the old resource is deleted
+    user_source = event["ResourceProperties"]["UserSource"]
+    return "{}-{}".format(event["LogicalResourceId"], hashlib.sha1(user_source.encode("utf-8")).hexdigest()[:8])
+
+def _get_client(resource_properties):
+    return pool_targets.get_client(resource_properties["CognitoRegion"], resource_properties.get("RoleArn"))
+
+def handler(event, context):
+    """
+    Main handler function, passes off it's work to crhelper's cfn_handler
+    """
+    helper(event, context)
@@ -1,53 +1,46 @@
 __version__ = '0.1.0'
 __version_info__ = tuple([int(num) for num in __version__.split('.')])
 
-import boto3
+import attribute_sinks
 from crhelper import CfnResource
+import json
 import logging
+import pool_targets
+import resource_models
+import schemas
 import re
 
 logger = logging.getLogger(__name__)
 # Initialise the helper, all inputs are optional, this example shows the defaults
 helper = CfnResource(json_logging=False, log_level='DEBUG', boto_level='CRITICAL')
+helper.validate(schemas.USER_POOL_CLIENT.validate)
+helper.validate_delete(schemas.USER_POOL_CLIENT.validate_delete)
+
+# ClientIdType of Cognito, physical ids crhelper generates for failed creates do not match it
+CLIENT_ID = re.compile(r"[\w+]+")
+
+# UserPoolClient attributes returned in Data when ExportAttributes is not set,
+# UserPoolId and ClientId are always returned
+DEFAULT_EXPORT_ATTRIBUTES = ["ClientName", "AllowedOAuthFlows", "AllowedOAuthScopes"]
 
 @helper.create
 def create(event, context):
     """
     Creates a user pool client with the specified attributes.
+    The client is created in every target user pool at once. If any of the
+    pools fails, the clients that were created are deleted again.
+
+    The client attributes listed in ExportAttributes are returned in Data,
+    for Fn::GetAtt, and written to the ExportSink if one is set.
     """
     logger.debug("Creating app client..")
     resource_properties = event["ResourceProperties"]
 
-    user_pool_id = resource_properties.get("UserPoolId")
-    app_client_name = resource_properties.get("AppClientName")
-    scope = resource_properties.get("CustomScope")
-    cognito_region = resource_properties.get("CognitoRegion")
-
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    physical_resource_id = _create_clients(resource_properties)
 
-    try:
-        response = client.create_user_pool_client(
-            UserPoolId=user_pool_id,
-            ClientName=app_client_name,
-            GenerateSecret=True,
-            RefreshTokenValidity=30,
-            AllowedOAuthFlows=[
-                'client_credentials',
-            ],
-            AllowedOAuthScopes=[
-                scope
-            ],
-            AllowedOAuthFlowsUserPoolClient=True
-        )
+    logger.debug("Finished creating app client..")
 
-        logger.debug("Finished creating app client..")
-
-        physical_resource_id = response.get("UserPoolClient").get("ClientId")
-        return physical_resource_id
-
-    except Exception as err:
-        logger.error("exception occured: {}".format(err))
-        raise ValueError("unable to create app client: {}".format(err))
+    return physical_resource_id
 
 @helper.update
 def update(event, context):
@@ -56,98 +49,214 @@ def update(event, context):
     Note if in the future we want to add ability to
     update the client's other properties,
     Add them in the update_user_pool_client call here.
+
+    When the target user pools change, or a client no longer exists, new
+    clients are created in every target and a new physical id is returned,
+    so CloudFormation deletes the previous clients during cleanup.
     """
     logger.debug("Updating app client..")
 
     resource_properties = event["ResourceProperties"]
 
-    user_pool_id = resource_properties.get("UserPoolId")
-    app_client_name = resource_properties.get("AppClientName")
-    scope = resource_properties.get("CustomScope")
-    cognito_region = resource_properties.get("CognitoRegion")
-    client_id = event['PhysicalResourceId']
+    settings = resource_models.user_pool_client(resource_properties)
+    attributes = resource_properties.get("ExportAttributes") or DEFAULT_EXPORT_ATTRIBUTES
+    targets = pool_targets.get_targets(resource_properties)
+    old_targets = pool_targets.get_targets(event.get("OldResourceProperties", resource_properties))
+    client_ids = resource_models.user_pool_client_ids(event['PhysicalResourceId'], old_targets)
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    for target in targets:
+        target["ClientId"] = client_ids.get(target["UserPoolId"])
 
-    try:
-        client.describe_user_pool_client(
-            UserPoolId=user_pool_id,
-            ClientId=client_id)
-
-        client.update_user_pool_client(
-            UserPoolId=user_pool_id,
-            ClientId=client_id,
-            ClientName=app_client_name,
-            AllowedOAuthFlows=[
-                'client_credentials',
-            ],
-            AllowedOAuthScopes=[
-                scope
-            ],
-            AllowedOAuthFlowsUserPoolClient=True
-        )
-        physical_resource_id = event['PhysicalResourceId']
-        return physical_resource_id
+    if len(targets) != len(client_ids) or not all(target["ClientId"] for target in targets):
+        logger.debug("Target user pools changed, replacing app client..")
+        return _create_clients(resource_properties)
 
-    except Exception:
-        response = client.create_user_pool_client(
-            UserPoolId=user_pool_id,
-            ClientName=app_client_name,
-            GenerateSecret=True,
-            RefreshTokenValidity=30,
-            AllowedOAuthFlows=[
-                'client_credentials',
-            ],
-            AllowedOAuthScopes=[
-                scope
-            ],
-            AllowedOAuthFlowsUserPoolClient=True
+    def describe_user_pool_client(client, target):
+        try:
+            client.describe_user_pool_client(
+                UserPoolId=target["UserPoolId"],
+                ClientId=target["ClientId"])
+        except client.exceptions.ResourceNotFoundException:
+            return {"Missing": True}
+
+    # replacing rotates the secrets of every client, so only a client that
+    # is gone replaces them, any other error fails the update
+    results = pool_targets.apply(targets, describe_user_pool_client)
+    pool_targets.raise_for_failures(results, "unable to describe app client")
+    if any(result.get("Missing") for result in results):
+        logger.debug("App client no longer exists, replacing app client..")
+        return _create_clients(resource_properties)
+
+    def update_user_pool_client(client, target):
+        response = client.update_user_pool_client(
+            UserPoolId=target["UserPoolId"],
+            ClientId=target["ClientId"],
+            **settings
         )
-        physical_resource_id = response.get("UserPoolClient").get("ClientId")
-        return physical_resource_id
+        return {"UserPoolClient": response.get("UserPoolClient")}
+
+    results = pool_targets.apply(targets, update_user_pool_client)
+    helper.Data["Targets"] = pool_targets.outcomes(results)
+    pool_targets.raise_for_failures(results, "unable to update app client")
+
+    _export_attributes(resource_properties, _get_attributes(results, attributes))
+
+    physical_resource_id = event['PhysicalResourceId']
+    return physical_resource_id
 
 @helper.delete
 def delete(event, context):
     """
-    Delete a user pool client.
+    Delete a user pool client from every target user pool.
 
     """
     logger.debug("Deleting app client..")
 
-    user_pool_id = event["ResourceProperties"].get("UserPoolId")
-    cognito_region = event["ResourceProperties"].get("CognitoRegion")
+    resource_properties = event["ResourceProperties"]
+    targets = pool_targets.get_targets(resource_properties)
+    client_ids = resource_models.user_pool_client_ids(event['PhysicalResourceId'], targets)
+    targets = dict((target["UserPoolId"], target) for target in targets)
+
+    # the physical id is the source of truth for what has to be deleted, a
+    # user pool id starts with the region it lives in
+    targets = [
+        dict(targets.get(user_pool_id, {
+            "CognitoRegion": user_pool_id.split("_")[0],
+            "UserPoolId": user_pool_id,
+            "RoleArn": resource_properties.get("RoleArn")
+        }), ClientId=client_id)
+        for user_pool_id, client_id in client_ids.items()
+    ]
+    for target in targets:
+        if not CLIENT_ID.fullmatch(target["ClientId"]):
+            logger.debug("No app client to delete in {}, {} is not a client id. Continue."
+                         .format(target["UserPoolId"], target["ClientId"]))
+    targets = [target for target in targets if CLIENT_ID.fullmatch(target["ClientId"])]
 
-    client = boto3.client("cognito-idp", region_name=cognito_region)
+    results = pool_targets.apply(targets, _delete_user_pool_client)
+    helper.Data["Targets"] = pool_targets.outcomes(results)
+    pool_targets.raise_for_failures(results, "unable to delete app client")
 
-    if not re.match(r'[\w+]+', event.get('PhysicalResourceId')):
-        logger.debug("No physical resource to delete. Continue.")
+    if resource_properties.get("ExportSink"):
+        records = [{"UserPoolId": target["UserPoolId"], "ClientId": target["ClientId"]}
+                   for target in targets]
+        attribute_sinks.get_sink(resource_properties["ExportSink"]).delete(records)
+
+    logger.debug("Finished deleting app client..")
 
+    return
+
+def _create_clients(resource_properties):
+    """
+    Creates the app client in every target user pool and returns the
+    physical resource id that identifies all of them.
+    """
+    settings = resource_models.user_pool_client(resource_properties)
+    attributes = resource_properties.get("ExportAttributes") or DEFAULT_EXPORT_ATTRIBUTES
+    targets = pool_targets.get_targets(resource_properties)
+
+    def create_user_pool_client(client, target):
+        response = client.create_user_pool_client(
+            UserPoolId=target["UserPoolId"],
+            GenerateSecret=True,
+            **settings
+        )
+        return {
+            "ClientId": response.get("UserPoolClient").get("ClientId"),
+            "UserPoolClient": response.get("UserPoolClient")
+        }
+
+    results = pool_targets.apply(targets, create_user_pool_client,
+                                 rollback=_delete_user_pool_client)
+    helper.Data["Targets"] = pool_targets.outcomes(results)
+    pool_targets.raise_for_failures(results, "unable to create app client")
+
+    # the clients exist from here on, they are deleted again if their
+    # attributes cannot be exported
+    try:
+        _export_attributes(resource_properties, _get_attributes(results, attributes))
+    except Exception as err:
+        logger.error("exception occured: {}".format(err))
+        pool_targets.apply(results, _delete_user_pool_client)
+        raise ValueError("unable to export app client attributes: {}".format(err))
+
+    if "Targets" not in resource_properties:
+        return results[0]["ClientId"]
+    return ",".join("{}/{}".format(result["UserPoolId"], result["ClientId"])
+                    for result in results)
+
+def _get_attributes(results, attributes):
+    """
+    Returns the exported attributes of the app client of every target, in
+    the order of the targets.
+    """
+    def get_attributes(client, result):
+        return {"Attributes": _export(client, result["UserPoolClient"], attributes)}
+
+    results = pool_targets.apply(results, get_attributes)
+    pool_targets.raise_for_failures(results, "unable to describe app client")
+    return [result["Attributes"] for result in results]
+
+def _export(client, user_pool_client, attributes):
+    """
+    Returns the requested attributes of a UserPoolClient as strings, so they
+    can be read with Fn::GetAtt. Lists are joined with commas, objects are
+    serialised to JSON.
+    """
+    if any(name not in user_pool_client for name in attributes):
+        # update_user_pool_client does not return every attribute, e.g. the secret
+        user_pool_client = client.describe_user_pool_client(
+            UserPoolId=user_pool_client["UserPoolId"],
+            ClientId=user_pool_client["ClientId"]
+        ).get("UserPoolClient")
+
+    exported = {
+        "UserPoolId": user_pool_client["UserPoolId"],
+        "ClientId": user_pool_client["ClientId"]
+    }
+    for name in attributes:
+        value = user_pool_client.get(name)
+        if isinstance(value, list):
+            value = ",".join(str(item) for item in value)
+        elif isinstance(value, dict):
+            value = json.dumps(value, sort_keys=True)
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        elif hasattr(value, "isoformat"):
+            value = value.isoformat()
+        elif value is None:
+            value = ""
+        exported[name] = str(value)
+    return exported
+
+def _export_attributes(resource_properties, records):
+    """
+    Returns the attributes of the first target in Data and writes the
+    attributes of every target to the ExportSink.
+    """
+    helper.Data.update(records[0])
+    if "ClientSecret" in records[0]:
+        helper.NoEcho = True
+
+    if resource_properties.get("ExportSink"):
+        attribute_sinks.get_sink(resource_properties["ExportSink"]).write(records)
+
+def _delete_user_pool_client(client, target):
     try:
         client.describe_user_pool_client(
-            UserPoolId=user_pool_id,
-            ClientId=event['PhysicalResourceId']
+            UserPoolId=target["UserPoolId"],
+            ClientId=target["ClientId"]
         )
-    except Exception:
+    except client.exceptions.ResourceNotFoundException:
         logger.debug("Unable to find user pool client to delete. ClientId: {}"
-                     .format(event['PhysicalResourceId']))
+                     .format(target["ClientId"]))
         return
 
     client.delete_user_pool_client(
-        UserPoolId=user_pool_id,
-        ClientId=event['PhysicalResourceId']
+        UserPoolId=target["UserPoolId"],
+        ClientId=target["ClientId"]
     )
 
-    logger.debug("Finished deleting app client..")
-
-    return
-
-@helper.poll_create
-def poll_create(event, context):
-    logger.info("Create polling..")
-    # Return a resource id or True to indicate that creation is complete. if True is returned an id
-    # will be generated
-    return True
-
 def handler(event, context):
     """
     Main handler function, passes off it's work to crhelper's cfn_handler